@@ -1,15 +1,138 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
 
 from chatrooms.models import Message, Room, Topic
 
 # Register your models here.
 
 
+def estimated_row_count(model, using: str) -> int | None:
+    """
+    The planner's row count for ``model``'s table, read from statistics
+    instead of counting. SQLite only has statistics after ANALYZE (or
+    PRAGMA optimize); without them the primary key range stands in.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                           [connection.ops.quote_name(table)])
+        elif connection.vendor == 'mysql':
+            cursor.execute("SELECT table_rows FROM information_schema.tables "
+                           "WHERE table_schema = DATABASE() AND table_name = %s", [table])
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                cursor.execute("SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 "
+                               "WHERE tbl = %s", [table])
+                row = cursor.fetchone()
+                if row[0] is not None:
+                    return row[0]
+            pk = connection.ops.quote_name(model._meta.pk.column)
+            cursor.execute(f"SELECT COALESCE(MAX({pk}) - MIN({pk}) + 1, 0) "
+                           f"FROM {connection.ops.quote_name(table)}")
+        else:
+            return None
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 for tables it has never analyzed.
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Avoids exact ``COUNT(*)`` over large tables: an unfiltered changelist
+    uses the table's estimated size, a filtered one counts at most
+    ``max_count`` rows, or up to the page after ``page_hint`` when that
+    is further.
+    """
+    max_count = 10_000
+
+    def __init__(self, *args, page_hint: int = 1, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.page_hint = page_hint
+
+    @cached_property
+    def count(self) -> int:
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None:
+                return estimate
+        # Count far enough to cover the requested page, and claim one page
+        # more whenever the limit is reached so the next page stays reachable.
+        limit = max(self.max_count, (self.page_hint + 1) * self.per_page)
+        count = queryset.order_by()[:limit].count()
+        return count + self.per_page if count == limit else count
+
+
+class AutocompleteFilter(admin.RelatedFieldListFilter):
+    """
+    A related-field filter that searches the related admin as you type
+    instead of listing every related row in the sidebar.
+    """
+    template = 'admin/chatrooms/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path) -> None:
+        self.model_admin = model_admin
+        super().__init__(field, request, params, model, model_admin, field_path)
+
+    def field_choices(self, field, request, model_admin) -> list:
+        return []
+
+    def has_output(self) -> bool:
+        return True
+
+    def widget(self) -> str:
+        chooser = forms.ModelChoiceField(
+            self.field.remote_field.model._default_manager.all(), required=False,
+            widget=AutocompleteSelect(self.field, self.model_admin.admin_site))
+        return chooser.widget.render(
+            self.lookup_kwarg, self.lookup_val[-1] if self.lookup_val else None,
+            attrs={'id': f'filter_{self.lookup_kwarg}', 'class': 'autocomplete-filter'})
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables too big to count or list in full:
+    estimated counts, no facet counts and filters that never enumerate
+    related rows.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True) -> EstimatedCountPaginator:
+        try:
+            page = int(request.GET.get(PAGE_VAR, 1))
+        except ValueError:
+            page = 1
+        return self.paginator(queryset, per_page, orphans, allow_empty_first_page,
+                              page_hint=page)
+
+    @property
+    def media(self) -> forms.Media:
+        autocomplete = AutocompleteSelect(Message._meta.get_field('room'), self.admin_site)
+        return super().media + autocomplete.media + forms.Media(js=['js/admin-filters.js'])
+
+
 @admin.register(Room)
-class RoomAdmin(admin.ModelAdmin):
-    list_display = ['name', 'host']
+class RoomAdmin(LargeTableAdmin):
+    list_display = ['name', 'host', 'topic', 'participant_count', 'updated_at']
+    list_select_related = ['host', 'topic']
     search_fields = ['name']
-    list_filter = ['topic', 'host']
+    list_filter = [('topic', AutocompleteFilter), ('host', AutocompleteFilter)]
+    # Matches room_updated_idx, so pages come straight off the index.
+    ordering = ['-updated_at', '-id']
+    sortable_by = ['updated_at']
+
+    autocomplete_fields = ['host', 'topic']
 
 
 @admin.register(Topic)
@@ -18,8 +141,13 @@ class TopicAdmin(admin.ModelAdmin):
 
 
 @admin.register(Message)
-class MessageAdmin(admin.ModelAdmin):
-    list_filter = ['user', 'room']
+class MessageAdmin(LargeTableAdmin):
+    list_display = ['__str__', 'user', 'room', 'created_at']
+    list_select_related = ['user', 'room']
+    list_filter = [('user', AutocompleteFilter), ('room', AutocompleteFilter)]
+    # Served by message_created_idx, or by the (room|user, created_at)
+    # indexes when filtered.
+    ordering = ['-created_at', '-id']
     sortable_by = ["created_at"]
 
     readonly_fields = ['created_at', 'updated_at']
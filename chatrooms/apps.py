@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ChatroomsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'chatrooms'
+
+    def ready(self) -> None:
+        from chatrooms import signals  # noqa: F401
@@ -0,0 +1,88 @@
+import json
+import zlib
+from datetime import datetime
+from typing import Any
+
+from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.query import QuerySet
+from django.utils.dateparse import parse_datetime
+
+from chatrooms.models import Message, MessageArchiveSegment, Room
+from chatrooms.pagination import KeysetPage, keyset_before
+
+User = get_user_model()
+
+ARCHIVE_FIELDS = ('id', 'user_id', 'content', 'created_at', 'updated_at')
+SEGMENT_ORDER = ('last_created_at', 'id')
+
+
+def pack(rows: list[dict[str, Any]]) -> bytes:
+    return zlib.compress(json.dumps(
+        [[row[name] for name in ARCHIVE_FIELDS] for row in rows],
+        cls=DjangoJSONEncoder, separators=(',', ':')).encode())
+
+
+def unpack(payload: bytes) -> list[dict[str, Any]]:
+    rows = []
+    for values in json.loads(zlib.decompress(payload)):
+        row = dict(zip(ARCHIVE_FIELDS, values))
+        row['created_at'] = parse_datetime(row['created_at'])
+        row['updated_at'] = parse_datetime(row['updated_at'])
+        rows.append(row)
+    return rows
+
+
+def archive_room(room_id: int, cutoff: datetime, segment_size: int) -> tuple[int, int]:
+    """
+    Move the messages of one room created before ``cutoff`` into archive
+    segments of up to ``segment_size`` messages, oldest first. Each segment
+    is written and its messages deleted in one transaction. Returns the
+    number of segments and messages archived.
+    """
+    segments = archived = 0
+    queryset = Message.objects.filter(room_id=room_id, created_at__lt=cutoff)
+    while True:
+        with transaction.atomic():
+            rows = list(queryset.order_by('created_at', 'id')
+                        .values(*ARCHIVE_FIELDS)[:segment_size])
+            if not rows:
+                return segments, archived
+            MessageArchiveSegment.objects.create(
+                room_id=room_id, message_count=len(rows),
+                first_created_at=rows[0]['created_at'],
+                last_created_at=rows[-1]['created_at'],
+                payload=pack(rows))
+            Message.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+        segments += 1
+        archived += len(rows)
+
+
+def newest_segment(room: Room) -> QuerySet[MessageArchiveSegment]:
+    return (MessageArchiveSegment.objects.filter(room=room)
+            .order_by('-last_created_at', '-id').values_list('pk', flat=True))
+
+
+def archive_page(room: Room, segment_id: int | None = None) -> KeysetPage:
+    """
+    Return the messages of one archive segment of ``room`` as unsaved
+    ``Message`` instances, newest first like the hot pages. Without
+    ``segment_id`` the newest segment is used; the page cursor is the id of
+    the next older segment.
+    """
+    segments = MessageArchiveSegment.objects.filter(room=room)
+    segment = segments.filter(pk=segment_id if segment_id else newest_segment(room)[:1]).first()
+    if segment is None:
+        return KeysetPage()
+    older = (segments.filter(keyset_before(SEGMENT_ORDER, (segment.last_created_at, segment.pk)))
+             .order_by('-last_created_at', '-id').values_list('pk', flat=True).first())
+
+    rows = unpack(segment.payload)
+    users = User.objects.in_bulk({row['user_id'] for row in rows})
+    # Messages of deleted users are dropped, as the hot table cascades them.
+    items = [Message(room=room, user=users[row.pop('user_id')], **row)
+             for row in reversed(rows) if row['user_id'] in users]
+    for message in items:
+        message.archived = True
+    return KeysetPage(items=items, has_more=older is not None, cursor=older)
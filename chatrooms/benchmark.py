@@ -0,0 +1,139 @@
+import asyncio
+import json
+import math
+import platform
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted ``samples``."""
+    if not samples:
+        return 0.0
+    rank = max(math.ceil(fraction * len(samples)), 1)
+    return samples[rank - 1]
+
+
+@dataclass
+class Result:
+    name: str
+    url: str
+    requests: int = 0
+    errors: int = 0
+    concurrency: int = 1
+    elapsed: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+    queries: list[int] = field(default_factory=list)
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            'name': self.name,
+            'url': self.url,
+            'requests': self.requests,
+            'errors': self.errors,
+            'concurrency': self.concurrency,
+            'throughput_rps': round(self.requests / self.elapsed, 1) if self.elapsed else 0,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 0.50) * 1000, 2),
+                'p95': round(percentile(latencies, 0.95) * 1000, 2),
+                'p99': round(percentile(latencies, 0.99) * 1000, 2),
+                'max': round(latencies[-1] * 1000, 2) if latencies else 0,
+            },
+            'queries_per_request': (round(sum(self.queries) / len(self.queries), 2)
+                                    if self.queries else None),
+        }
+
+
+def run_sync(name: str, url: str, requests: int, concurrency: int,
+             client_factory: Callable[[], Client] | None = None,
+             method: str = 'get', data: dict | None = None) -> Result:
+    """
+    Drive ``url`` through the Django test client from ``concurrency``
+    threads, each with its own client and database connection.
+    """
+    result = Result(name=name, url=url, concurrency=concurrency)
+    lock = threading.Lock()
+    local = threading.local()
+    factory = client_factory or (lambda: Client())
+
+    def one(index: int) -> None:
+        if not hasattr(local, 'client'):
+            local.client = factory()
+        payload = data(index) if callable(data) else data
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(local.client, method)(url, payload)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            latency = time.perf_counter() - started
+        with lock:
+            result.requests += 1
+            result.errors += response.status_code >= 400
+            result.latencies.append(latency)
+            result.queries.append(len(queries))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def run_async(name: str, url: str, requests: int, concurrency: int,
+              client_factory: Callable[[], AsyncClient] | None = None) -> Result:
+    """
+    Drive ``url`` through the ASGI request handler with ``concurrency``
+    in-flight requests on one event loop. Query counts are not captured
+    because sync views run on executor threads.
+    """
+    result = Result(name=name, url=url, concurrency=concurrency)
+    factory = client_factory or (lambda: AsyncClient())
+
+    async def main() -> None:
+        client = factory()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one() -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(url)
+                result.latencies.append(time.perf_counter() - started)
+                result.requests += 1
+                result.errors += response.status_code >= 400
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        result.elapsed = time.perf_counter() - started
+
+    asyncio.run(main())
+    return result
+
+
+def benchmark_environment() -> override_settings:
+    # The test clients always send Host: testserver.
+    return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'])
+
+
+def write_report(path: str, results: list[Result], **meta) -> dict:
+    report = {
+        'timestamp': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        **meta,
+        'results': [result.summary() for result in results],
+    }
+    with open(path, 'w') as output:
+        json.dump(report, output, indent=2)
+    return report
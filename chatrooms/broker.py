@@ -0,0 +1,98 @@
+import asyncio
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class Subscription:
+    """
+    A single listener on a room. Payloads are handed over to the event loop
+    that created the subscription, so publishers may live on any thread.
+    """
+
+    def __init__(self, broker: "BaseBroker", room_id: int, maxsize: int) -> None:
+        self.broker = broker
+        self.room_id = room_id
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, payload: str) -> None:
+        if self.queue.full():
+            # Slow consumer: drop the oldest payload rather than grow without bound.
+            self.queue.get_nowait()
+        self.queue.put_nowait(payload)
+
+    async def get(self) -> str:
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self.broker.unsubscribe(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> str:
+        return await self.get()
+
+
+class BaseBroker:
+    def publish(self, room_id: int, payload: str) -> None:
+        raise NotImplementedError
+
+    def subscribe(self, room_id: int) -> Subscription:
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        raise NotImplementedError
+
+
+class InMemoryBroker(BaseBroker):
+    """
+    Fans payloads out to subscribers of the current process. Publishing
+    costs one dict lookup plus one loop callback per subscriber.
+    """
+
+    def __init__(self, queue_size: int = 100) -> None:
+        self.queue_size = queue_size
+        self.lock = threading.Lock()
+        self.rooms: dict[int, set[Subscription]] = defaultdict(set)
+
+    def publish(self, room_id: int, payload: str) -> None:
+        with self.lock:
+            subscribers = tuple(self.rooms.get(room_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(
+                    subscription.deliver, payload)
+            except RuntimeError:
+                # The subscriber's event loop has shut down.
+                self.unsubscribe(subscription)
+
+    def subscribe(self, room_id: int) -> Subscription:
+        subscription = Subscription(self, room_id, self.queue_size)
+        with self.lock:
+            self.rooms[room_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self.lock:
+            subscribers = self.rooms.get(subscription.room_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self.rooms[subscription.room_id]
+
+    def subscriber_count(self, room_id: int) -> int:
+        return len(self.rooms.get(room_id, ()))
+
+
+@lru_cache(maxsize=None)
+def get_broker() -> BaseBroker:
+    options = getattr(settings, 'CHATROOMS_BROKER', {})
+    backend = import_string(options.get(
+        'BACKEND', 'chatrooms.broker.InMemoryBroker'))
+    return backend(**options.get('OPTIONS', {}))
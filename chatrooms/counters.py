@@ -0,0 +1,32 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def count_subquery(queryset, field: str) -> Coalesce:
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field).annotate(total=Count('*')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def rebuild_room_counts(Room, rooms=None) -> int:
+    rooms = Room.objects.all() if rooms is None else rooms
+    return rooms.update(participant_count=count_subquery(
+        Room.participants.through.objects, 'room'))
+
+
+def rebuild_topic_counts(Topic, Room, topics=None) -> int:
+    topics = Topic.objects.all() if topics is None else topics
+    return topics.update(room_count=count_subquery(Room.objects, 'topic'))
+
+
+def adjust(queryset, field: str, delta: int) -> None:
+    if delta:
+        queryset.update(**{field: F(field) + delta})
+
+
+def rebuild_message_seq(Room, Message, rooms=None) -> int:
+    # Never move a sequence backwards, or read markers past it would hide
+    # new messages; archived and deleted messages keep their numbers.
+    rooms = Room.objects.all() if rooms is None else rooms
+    return rooms.update(message_seq=Greatest(
+        F('message_seq'), count_subquery(Message.objects, 'room')))
@@ -0,0 +1,118 @@
+import csv
+from typing import Any, AsyncIterator, Iterator
+
+from django.contrib.auth import get_user_model
+from django.db.models.query import QuerySet
+
+from chatrooms.archive import unpack
+from chatrooms.models import Message, MessageArchiveSegment
+from chatrooms.serializers import MESSAGE_ROW_FIELDS, dumps, serialize_message_row
+
+User = get_user_model()
+
+CSV_COLUMNS = ('id', 'room', 'user_id', 'username', 'created_at', 'content')
+
+
+def archive_segments(room_id: int) -> QuerySet[Any]:
+    return (MessageArchiveSegment.objects.filter(room_id=room_id)
+            .order_by('last_created_at', 'id').values_list('payload', flat=True))
+
+
+def message_rows(room_id: int, after: int | None) -> QuerySet[Any]:
+    queryset = Message.objects.filter(room_id=room_id)
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    return queryset.order_by('id').values(*MESSAGE_ROW_FIELDS)
+
+
+def segment_rows(payload: bytes, after: int | None) -> list[dict[str, Any]]:
+    return [row for row in unpack(payload) if after is None or row['id'] > after]
+
+
+def usernames_of(rows: list[dict[str, Any]]) -> QuerySet[Any]:
+    return User.objects.filter(pk__in={row['user_id'] for row in rows}).values_list(
+        'pk', 'username')
+
+
+def with_usernames(room_id: int, rows: list[dict[str, Any]],
+                   usernames: dict[int, str]) -> Iterator[dict[str, Any]]:
+    for row in rows:
+        if row['user_id'] in usernames:
+            yield {'room_id': room_id, 'user__username': usernames[row['user_id']], **row}
+
+
+def archived_rows(room_id: int, after: int | None) -> Iterator[dict[str, Any]]:
+    # Payloads are large; hold a handful of segments at a time.
+    for payload in archive_segments(room_id).iterator(chunk_size=8):
+        rows = segment_rows(payload, after)
+        yield from with_usernames(room_id, rows, dict(usernames_of(rows)))
+
+
+def transcript_rows(room_id: int, after: int | None = None,
+                    chunk_size: int = 2000) -> Iterator[dict[str, Any]]:
+    """
+    Every message of a room as ``values()`` rows, archived history first
+    and then the message table in id order. Rows are streamed from the
+    database ``chunk_size`` at a time; pass the last exported id as
+    ``after`` to resume an interrupted export.
+    """
+    yield from archived_rows(room_id, after)
+    yield from message_rows(room_id, after).iterator(chunk_size=chunk_size)
+
+
+async def atranscript_rows(room_id: int, after: int | None = None,
+                           chunk_size: int = 2000) -> AsyncIterator[dict[str, Any]]:
+    """
+    Async counterpart of ``transcript_rows`` for ASGI responses, which
+    would otherwise read a sync iterator to the end before sending it.
+    """
+    async for payload in archive_segments(room_id).aiterator(chunk_size=8):
+        rows = segment_rows(payload, after)
+        usernames = {pk: username async for pk, username in usernames_of(rows)}
+        for row in with_usernames(room_id, rows, usernames):
+            yield row
+    async for row in message_rows(room_id, after).aiterator(chunk_size=chunk_size):
+        yield row
+
+
+def ndjson_line(row: dict[str, Any]) -> str:
+    return dumps(serialize_message_row(row)) + '\n'
+
+
+class Echo:
+    """File-like object that hands each written line straight back."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+csv_writer = csv.writer(Echo())
+
+
+def csv_line(row: dict[str, Any]) -> str:
+    return csv_writer.writerow((row['id'], row['room_id'], row['user_id'], row['user__username'],
+                                row['created_at'].isoformat(), row['content']))
+
+
+# format -> (content type, header line, line encoder)
+FORMATS = {
+    'ndjson': ('application/x-ndjson', '', ndjson_line),
+    'csv': ('text/csv', csv_writer.writerow(CSV_COLUMNS), csv_line),
+}
+
+
+def transcript_lines(rows: Iterator[dict[str, Any]], export_format: str) -> Iterator[str]:
+    _, header, encode = FORMATS[export_format]
+    if header:
+        yield header
+    for row in rows:
+        yield encode(row)
+
+
+async def atranscript_lines(rows: AsyncIterator[dict[str, Any]],
+                            export_format: str) -> AsyncIterator[str]:
+    _, header, encode = FORMATS[export_format]
+    if header:
+        yield header
+    async for row in rows:
+        yield encode(row)
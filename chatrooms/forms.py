@@ -25,3 +25,7 @@ class RoomForm(forms.ModelForm):
         exclude = ['created_at', 'updated_at', 'topic', 'participants']
 
     topic_input = forms.CharField(max_length=200, strip=True, required=True, min_length=2)
+
+
+class AvatarForm(forms.Form):
+    avatar = forms.FileField()
@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from chatrooms.archive import archive_room
+from chatrooms.models import Message
+
+
+class Command(BaseCommand):
+    help = ("Move messages older than --days out of the message table into "
+            "compressed per-room archive segments.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=180,
+                            help="Archive messages created more than this many days ago.")
+        parser.add_argument('--segment-size', type=int, default=200,
+                            help="Messages per archive segment (one page of archived history).")
+        parser.add_argument('--vacuum', action='store_true',
+                            help="VACUUM the SQLite database afterwards to return freed pages.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        room_ids = (Message.objects.filter(created_at__lt=cutoff)
+                    .order_by().values_list('room_id', flat=True).distinct())
+
+        segments = archived = 0
+        for room_id in list(room_ids):
+            room_segments, room_archived = archive_room(room_id, cutoff, options['segment_size'])
+            segments += room_segments
+            archived += room_archived
+            self.stdout.write(f"room {room_id}: {room_archived} messages "
+                              f"in {room_segments} segments")
+
+        if options['vacuum'] and connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('VACUUM')
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} messages into {segments} segments."))
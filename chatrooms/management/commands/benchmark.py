@@ -0,0 +1,109 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from chatrooms.benchmark import benchmark_environment, run_async, run_sync, write_report
+from chatrooms.models import Message, Room
+
+
+class Command(BaseCommand):
+    help = ("Load-test the read paths in chatrooms/urls.py and report latency "
+            "percentiles, throughput and queries per request as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Requests per URL.")
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--client', choices=['sync', 'async'], default='sync',
+                            help="Django test client (WSGI) or AsyncClient (ASGI).")
+        parser.add_argument('--only', nargs='*', help="Benchmark only these targets.")
+        parser.add_argument('--authenticated', action='store_true',
+                            help="Send the read requests as a logged-in user.")
+        parser.add_argument('--writes', action='store_true',
+                            help="Also benchmark posting messages (adds rows).")
+        parser.add_argument('--output', default='benchmark.json')
+
+    def targets(self) -> dict[str, str]:
+        room = Room.objects.order_by('-participant_count').first()
+        if room is None:
+            raise CommandError("No rooms to benchmark; run seed_data first.")
+        latest = Message.objects.filter(room=room).aggregate(latest=Max('id'))['latest'] or 0
+        return {
+            'home': reverse('home'),
+            'home_search': f"{reverse('home')}?q={room.topic.name.split()[-1]}",
+            'all_topics': reverse('all_topics'),
+            'room_detail': reverse('room_detail', args=[room.pk]),
+            'room_messages': f"{reverse('room_messages', args=[room.pk])}?after={latest}",
+            'user_profile': reverse('user_profile', args=[room.host_id]),
+            'login': reverse('login'),
+            'register': reverse('register'),
+        }
+
+    def handle(self, *args, **options):
+        targets = self.targets()
+        if options['only']:
+            unknown = set(options['only']) - set(targets)
+            if unknown:
+                raise CommandError(f"Unknown targets: {', '.join(sorted(unknown))}")
+            targets = {name: targets[name] for name in options['only']}
+
+        run = run_sync if options['client'] == 'sync' else run_async
+        client_factory = None
+        if options['authenticated']:
+            room = Room.objects.order_by('-participant_count').first()
+            client_factory = self.logged_in(
+                Client if options['client'] == 'sync' else AsyncClient,
+                room.participants.first() or room.host)
+        results = []
+        self.stdout.write(f"{'target':<16}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}"
+                          f"{'p99 ms':>10}{'queries':>9}{'errors':>8}")
+        if options['writes']:
+            results.append(self.benchmark_posts(options))
+        for name, url in targets.items():
+            with benchmark_environment():
+                result = run(name, url, options['requests'], options['concurrency'],
+                             client_factory=client_factory)
+            results.append(result)
+            self.report(result)
+
+        write_report(options['output'], results, client=options['client'],
+                     authenticated=options['authenticated'],
+                     concurrency=options['concurrency'],
+                     requests_per_target=options['requests'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def logged_in(self, client_class, user):
+        # Log in once, up front: force_login is sync and run_async calls the
+        # factory inside its event loop. Every client reuses the session cookie.
+        session = Client()
+        session.force_login(user)
+
+        def client():
+            client = client_class()
+            client.cookies.update(session.cookies)
+            return client
+        return client
+
+    def benchmark_posts(self, options):
+        room = Room.objects.order_by('-participant_count').first()
+        poster = room.participants.first() or room.host
+
+        # One poster would spend the run in its token bucket; measure the write path.
+        with benchmark_environment(), override_settings(CHATROOMS_MESSAGE_THROTTLE={}):
+            result = run_sync('room_post', reverse('room_detail', args=[room.pk]),
+                              options['requests'], options['concurrency'],
+                              client_factory=self.logged_in(Client, poster), method='post',
+                              data=lambda index: {'content': f'benchmark message {index}'})
+        self.report(result)
+        return result
+
+    def report(self, result) -> None:
+        summary = result.summary()
+        latency = summary['latency_ms']
+        queries = summary['queries_per_request']
+        self.stdout.write(
+            f"{result.name:<16}{summary['throughput_rps']:>9}{latency['p50']:>10}"
+            f"{latency['p95']:>10}{latency['p99']:>10}"
+            f"{'-' if queries is None else queries:>9}{summary['errors']:>8}")
@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import include, path, reverse
+
+from chatrooms.benchmark import benchmark_environment, run_async, write_report
+from chatrooms.models import Room
+from chatrooms.urls import build_urlpatterns
+
+
+def urlconf(async_views: bool) -> type:
+    # URL resolvers are cached per urlconf, so it must be hashable.
+    return type('URLConf', (), {'urlpatterns': [path('', include(build_urlpatterns(async_views)))]})
+
+
+class Command(BaseCommand):
+    help = ("Compare the sync and async home and room views on one ASGI worker "
+            "(a single event loop) at increasing concurrency.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help="Requests per target and concurrency level.")
+        parser.add_argument('--concurrency', type=int, nargs='*', default=[1, 8, 32, 64])
+        parser.add_argument('--output', default='benchmark_async.json')
+
+    def handle(self, *args, **options):
+        room = Room.objects.order_by('-participant_count').first()
+        if room is None:
+            raise CommandError("No rooms to benchmark; run seed_data first.")
+
+        results = []
+        self.stdout.write(f"{'views':<7}{'target':<13}{'concurrency':>12}{'rps':>9}"
+                          f"{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+        for mode in ('sync', 'async'):
+            with benchmark_environment(), override_settings(ROOT_URLCONF=urlconf(mode == 'async')):
+                targets = {'home': reverse('home'),
+                           'room_detail': reverse('room_detail', args=[room.pk])}
+                for name, url in targets.items():
+                    for concurrency in options['concurrency']:
+                        result = run_async(f'{mode}:{name}', url, options['requests'], concurrency)
+                        results.append(result)
+                        summary = result.summary()
+                        self.stdout.write(
+                            f"{mode:<7}{name:<13}{concurrency:>12}{summary['throughput_rps']:>9}"
+                            f"{summary['latency_ms']['p50']:>10}{summary['latency_ms']['p95']:>10}"
+                            f"{summary['errors']:>8}")
+
+        write_report(options['output'], results, requests_per_target=options['requests'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
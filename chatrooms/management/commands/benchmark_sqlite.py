@@ -0,0 +1,124 @@
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+
+from chatrooms.benchmark import percentile
+from chatrooms.models import Message, Room, Topic
+from studybuddy.sqlite import PROFILES, sqlite_database
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Compare SQLite connection profiles under concurrent message posting "
+            "and room reads, each on a scratch database file.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', nargs='*', default=list(PROFILES))
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200,
+                            help="Message posts per writer thread.")
+        parser.add_argument('--output', default='benchmark_sqlite.json')
+
+    def handle(self, *args, **options):
+        results = []
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in options['profiles']:
+                alias = f'benchmark_{profile}'
+                config = sqlite_database(Path(directory) / f'{profile}.sqlite3', profile=profile)
+                connections.settings[alias] = connections.configure_settings(
+                    {'default': connections.settings['default'], alias: config})[alias]
+                call_command('migrate', database=alias, verbosity=0)
+                result = self.run(alias, profile, options)
+                connections[alias].close()
+                del connections[alias]
+                del connections.settings[alias]
+                results.append(result)
+                self.stdout.write(
+                    f"{profile:<12} writes/s {result['writes_per_second']:>8} "
+                    f"reads/s {result['reads_per_second']:>8} "
+                    f"write p95 {result['write_latency_ms']['p95']:>8} ms "
+                    f"locked errors {result['locked_errors']:>5}")
+
+        with open(options['output'], 'w') as output:
+            json.dump({'workload': {key: options[key] for key in ('writers', 'readers', 'writes')},
+                       'results': results}, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def run(self, alias: str, profile: str, options) -> dict:
+        topic = Topic.objects.using(alias).create(name='benchmark')
+        host = User.objects.using(alias).create(username='host')
+        room = Room.objects.using(alias).create(name='benchmark', topic=topic, host=host)
+        users = [User.objects.using(alias).create(username=f'writer{index}')
+                 for index in range(options['writers'])]
+
+        lock = threading.Lock()
+        write_latencies: list[float] = []
+        errors = {'locked': 0}
+        reads = [0]
+        writing = threading.Event()
+        writing.set()
+
+        def write(user) -> None:
+            for index in range(options['writes']):
+                started = time.perf_counter()
+                try:
+                    with transaction.atomic(using=alias):
+                        room.participants.add(user)
+                        Message.objects.using(alias).create(
+                            room=room, user=user, content=f'message {index}')
+                except OperationalError:
+                    with lock:
+                        errors['locked'] += 1
+                    continue
+                with lock:
+                    write_latencies.append(time.perf_counter() - started)
+            connections[alias].close()
+
+        def read() -> None:
+            while writing.is_set():
+                try:
+                    list(Message.objects.using(alias).filter(room=room).select_related(
+                        'user').order_by('-created_at', '-id')[:50])
+                except OperationalError:
+                    with lock:
+                        errors['locked'] += 1
+                    continue
+                with lock:
+                    reads[0] += 1
+            connections[alias].close()
+
+        writers = [threading.Thread(target=write, args=(user,)) for user in users]
+        readers = [threading.Thread(target=read) for _ in range(options['readers'])]
+        started = time.perf_counter()
+        for thread in writers + readers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        writing.clear()
+        for thread in readers:
+            thread.join()
+
+        latencies = sorted(write_latencies)
+        return {
+            'profile': profile,
+            'writes': len(latencies),
+            'reads': reads[0],
+            'locked_errors': errors['locked'],
+            'elapsed_seconds': round(elapsed, 2),
+            'writes_per_second': round(len(latencies) / elapsed, 1),
+            'reads_per_second': round(reads[0] / elapsed, 1),
+            'write_latency_ms': {
+                name: round(percentile(latencies, fraction) * 1000, 2)
+                for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+            },
+        }
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chatrooms.export import FORMATS, transcript_lines, transcript_rows
+from chatrooms.models import Room
+
+
+class Command(BaseCommand):
+    help = ("Stream a room transcript, archived history included, as NDJSON or CSV "
+            "in constant memory.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('room', type=int)
+        parser.add_argument('--format', choices=list(FORMATS), default='ndjson')
+        parser.add_argument('--after', type=int, default=None,
+                            help="Resume after this message id.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--output', default='-',
+                            help="File to write, '-' for stdout. Appended to when resuming.")
+
+    def handle(self, *args, **options):
+        if not Room.objects.filter(pk=options['room']).exists():
+            raise CommandError(f"Room {options['room']} does not exist.")
+
+        rows = transcript_rows(options['room'], after=options['after'],
+                               chunk_size=options['chunk_size'])
+        lines = transcript_lines(rows, options['format'])
+        if options['after'] is not None and options['format'] == 'csv':
+            next(lines)  # The file being resumed already has its header.
+
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        mode = 'a' if options['after'] is not None else 'w'
+        with open(options['output'], mode, newline='', encoding='utf-8') as output:
+            output.writelines(lines)
+        self.stderr.write(f"Wrote {options['output']}")
@@ -0,0 +1,220 @@
+import json
+import time
+from collections import Counter
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries, transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from chatrooms.bulk import explicit_timestamps
+from chatrooms.counters import rebuild_message_seq, rebuild_room_counts, rebuild_topic_counts
+from chatrooms.models import Message, Room, Topic
+from chatrooms.sidebar import ACTIVITY, TOPICS, sidebar_cache
+
+User = get_user_model()
+
+REQUIRED_FIELDS = {
+    'user': ('username',),
+    'topic': ('name',),
+    'room': ('name', 'topic', 'host'),
+    'message': ('room', 'user', 'content'),
+}
+
+
+class Command(BaseCommand):
+    help = """
+    Import users, topics, rooms and messages from an NDJSON file, one
+    record per line:
+
+      {"type": "user", "username": "ada"}
+      {"type": "topic", "name": "python"}
+      {"type": "room", "id": "general", "name": "General", "topic": "python",
+       "host": "ada", "description": "..."}
+      {"type": "message", "id": "m1", "room": "general", "user": "ada",
+       "content": "hi", "created_at": "2024-01-01T10:00:00Z"}
+
+    Users and topics are matched by username and name and created when
+    missing. Rooms are matched by the room record's "id" (its name when it
+    has none), stored as Room.import_key, never by name; messages refer to
+    rooms by that id. Re-running an import, say with more lines appended,
+    reuses its rooms, and message ids make it skip messages already
+    imported.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=5_000,
+                            help="Lines per transaction.")
+
+    def handle(self, *args, **options):
+        # source keys -> primary keys; they grow with the number of distinct
+        # users, topics and rooms, not with the number of messages.
+        self.users: dict[str, int] = {}
+        self.topics: dict[str, int] = {}
+        self.rooms: dict[str, int] = {}
+        self.touched_rooms: set[int] = set()
+        self.counts: Counter[str] = Counter()
+        self.now = timezone.now()
+        started = time.perf_counter()
+
+        try:
+            source = open(options['path'], encoding='utf-8')
+        except OSError as error:
+            raise CommandError(error)
+        with source:
+            line_number = 0
+            while batch := list(islice(source, options['batch_size'])):
+                records = []
+                for line in batch:
+                    line_number += 1
+                    if not line.strip():
+                        continue
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        self.skip(f"line {line_number}: invalid JSON")
+                with transaction.atomic():
+                    self.import_batch(records)
+                # With DEBUG on every statement is kept; drop the batch's.
+                reset_queries()
+                self.report(line_number, started)
+
+        self.finish()
+        self.stdout.write(self.style.SUCCESS(
+            "Imported " + ', '.join(f"{count} {name}" for name, count in sorted(self.counts.items()))
+            + f" in {time.perf_counter() - started:.1f}s."))
+
+    def skip(self, reason: str) -> None:
+        self.counts['skipped'] += 1
+        if self.counts['skipped'] <= 20:
+            self.stderr.write(f"Skipped {reason}")
+
+    def report(self, lines: int, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{lines} lines, {self.counts['messages']} messages in {elapsed:.1f}s "
+                          f"({lines / elapsed if elapsed else 0:.0f} rows/s)")
+
+    def import_batch(self, records: list[dict]) -> None:
+        by_type: dict[str, list[dict]] = {name: [] for name in REQUIRED_FIELDS}
+        for record in records:
+            required = REQUIRED_FIELDS.get(record.get('type'))
+            if required is None:
+                self.skip(f"record of unknown type {record.get('type')!r}")
+            elif not all(record.get(field) for field in required):
+                self.skip(f"{record['type']} record without {', '.join(required)}")
+            else:
+                by_type[record['type']].append(record)
+
+        self.ensure_users({record['username'] for record in by_type['user']}
+                          | {record['host'] for record in by_type['room']}
+                          | {record['user'] for record in by_type['message']})
+        self.ensure_topics({record['name'] for record in by_type['topic']}
+                           | {record['topic'] for record in by_type['room']})
+        self.ensure_rooms(by_type['room'])
+        self.insert_messages(by_type['message'])
+
+    def missing(self, lookup: dict, model, field: str, keys: set[str]) -> set[str]:
+        keys = keys - lookup.keys()
+        if keys:
+            lookup.update(model.objects.filter(**{f'{field}__in': keys}).values_list(field, 'pk'))
+        return keys - lookup.keys()
+
+    def ensure_users(self, usernames: set[str]) -> None:
+        missing = self.missing(self.users, User, 'username', usernames)
+        if missing:
+            # Imported accounts cannot log in until they reset their password.
+            User.objects.bulk_create([User(username=name, password=make_password(None))
+                                      for name in missing])
+            self.counts['users'] += len(missing)
+            self.missing(self.users, User, 'username', missing)
+
+    def ensure_topics(self, names: set[str]) -> None:
+        missing = self.missing(self.topics, Topic, 'name', names)
+        if missing:
+            Topic.objects.bulk_create([Topic(name=name) for name in missing])
+            self.counts['topics'] += len(missing)
+            self.missing(self.topics, Topic, 'name', missing)
+
+    def ensure_rooms(self, records: list[dict]) -> None:
+        by_key: dict[str, dict] = {}
+        for record in records:
+            key = str(record.get('id', record['name']))
+            if key in self.rooms or key in by_key:
+                self.skip(f"room record with duplicate id {key!r}")
+                continue
+            by_key[key] = record
+        # Rooms from an earlier run of the same file are found by import_key.
+        missing = self.missing(self.rooms, Room, 'import_key', set(by_key))
+        new = []
+        for key, record in by_key.items():
+            if key not in missing:
+                continue
+            created = self.timestamp(record)
+            new.append(Room(name=record['name'], description=record.get('description', ''),
+                            topic_id=self.topics[record['topic']],
+                            host_id=self.users[record['host']], import_key=key,
+                            created_at=created, updated_at=created))
+        with explicit_timestamps(Room):
+            Room.objects.bulk_create(new)
+        self.rooms.update({room.import_key: room.pk for room in new})
+        self.counts['rooms'] += len(new)
+
+    def timestamp(self, record: dict):
+        value = parse_datetime(record.get('created_at') or '') or self.now
+        return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+    def insert_messages(self, records: list[dict]) -> None:
+        messages = []
+        keys: set[tuple[int, str]] = set()
+        for record in records:
+            room = self.rooms.get(str(record.get('room')))
+            if room is None:
+                self.skip(f"message {record.get('id')!r} for unknown room {record.get('room')!r}")
+                continue
+            created = self.timestamp(record)
+            message = Message(
+                room_id=room, user_id=self.users[record['user']], content=record['content'],
+                created_at=created, updated_at=created,
+                idempotency_key=f"import:{record['id']}" if 'id' in record else None)
+            if message.idempotency_key is not None:
+                if (message.user_id, message.idempotency_key) in keys:
+                    continue
+                keys.add((message.user_id, message.idempotency_key))
+            messages.append(message)
+        if keys:
+            # Messages whose idempotency key already exists were imported by
+            # an earlier batch or run; leave them out so the count is exact.
+            existing = set(Message.objects.filter(
+                user_id__in={user for user, _ in keys},
+                idempotency_key__in={key for _, key in keys},
+            ).values_list('user_id', 'idempotency_key')) & keys
+            messages = [message for message in messages
+                        if (message.user_id, message.idempotency_key) not in existing]
+        with explicit_timestamps(Message):
+            Message.objects.bulk_create(messages)
+
+        Participant = Room.participants.through
+        Participant.objects.bulk_create(
+            [Participant(room_id=room, user_id=user)
+             for room, user in {(message.room_id, message.user_id) for message in messages}],
+            ignore_conflicts=True)
+        self.touched_rooms.update(message.room_id for message in messages)
+        self.counts['messages'] += len(messages)
+
+    def finish(self) -> None:
+        rooms = Room.objects.filter(pk__in=self.touched_rooms | set(self.rooms.values()))
+        latest = Message.objects.filter(room=OuterRef('pk')).order_by(
+            '-created_at').values('created_at')[:1]
+        with transaction.atomic():
+            rooms.update(updated_at=Coalesce(Subquery(latest), F('created_at')))
+            rebuild_room_counts(Room, rooms)
+            rebuild_message_seq(Room, Message, rooms)
+            rebuild_topic_counts(Topic, Room, Topic.objects.filter(pk__in=self.topics.values()))
+        # bulk_create sends no signals, so refresh the sidebar by hand.
+        sidebar_cache.bump(TOPICS, ACTIVITY)
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from chatrooms.counters import rebuild_message_seq, rebuild_room_counts, rebuild_topic_counts
+from chatrooms.models import Message, Room, Topic
+
+
+class Command(BaseCommand):
+    help = ("Recompute the stored Room.participant_count, Room.message_seq and "
+            "Topic.room_count columns.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rooms = rebuild_room_counts(Room)
+            rebuild_message_seq(Room, Message)
+            topics = rebuild_topic_counts(Topic, Room)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt counters for {rooms} rooms and {topics} topics."))
@@ -0,0 +1,135 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from chatrooms.bulk import explicit_timestamps
+from chatrooms.counters import rebuild_message_seq, rebuild_room_counts, rebuild_topic_counts
+from chatrooms.models import Message, Room, Topic
+
+User = get_user_model()
+
+WORDS = ('python django sqlite index query cache async thread room topic study '
+         'exam notes lecture chapter homework project deadline review question '
+         'answer help pair session book paper math physics history art').split()
+
+
+class Command(BaseCommand):
+    help = "Seed a synthetic dataset of users, topics, rooms, participants and messages."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000)
+        parser.add_argument('--topics', type=int, default=50)
+        parser.add_argument('--rooms', type=int, default=2_000)
+        parser.add_argument('--participants', type=int, default=20,
+                            help="Participants per room.")
+        parser.add_argument('--messages', type=int, default=1_000_000)
+        parser.add_argument('--days', type=int, default=365,
+                            help="Spread message timestamps over this many days.")
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--password', default='studybuddy',
+                            help="Password shared by every generated user.")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.span = timedelta(days=options['days'])
+        started = time.perf_counter()
+
+        users = self.seed_users(options['users'], options['password'])
+        topics = self.seed_topics(options['topics'])
+        rooms = self.seed_rooms(options['rooms'], topics, users)
+        self.seed_participants(rooms, users, options['participants'])
+        self.seed_messages(options['messages'], rooms, users)
+
+        with transaction.atomic():
+            rebuild_room_counts(Room)
+            rebuild_message_seq(Room, Message)
+            rebuild_topic_counts(Topic, Room)
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded in {time.perf_counter() - started:.1f}s."))
+
+    def sentence(self, words: int) -> str:
+        return ' '.join(self.random.choices(WORDS, k=words)).capitalize()
+
+    def timestamp(self):
+        return self.now - self.span * self.random.random()
+
+    def insert(self, model, objects, label: str) -> None:
+        started = time.perf_counter()
+        total = 0
+        with explicit_timestamps(model):
+            for start in range(0, len(objects), self.batch_size):
+                with transaction.atomic():
+                    model.objects.bulk_create(objects[start:start + self.batch_size])
+                total += len(objects[start:start + self.batch_size])
+        self.report(label, total, started)
+
+    def report(self, label: str, total: int, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label}: {total} rows in {elapsed:.1f}s "
+                          f"({total / elapsed if elapsed else 0:.0f} rows/s)")
+
+    def seed_users(self, count: int, password: str) -> list[int]:
+        # Hashing is deliberately slow; hash once and share it.
+        hashed = make_password(password)
+        prefix = f'user{User.objects.count()}_'
+        self.insert(User, [User(username=f'{prefix}{i}', password=hashed)
+                           for i in range(count)], 'users')
+        return list(User.objects.filter(username__startswith=prefix).values_list('pk', flat=True))
+
+    def seed_topics(self, count: int) -> list[int]:
+        prefix = f'Topic {Topic.objects.count()}-'
+        self.insert(Topic, [Topic(name=f'{prefix}{i} {self.random.choice(WORDS)}')
+                            for i in range(count)], 'topics')
+        return list(Topic.objects.filter(name__startswith=prefix).values_list('pk', flat=True))
+
+    def seed_rooms(self, count: int, topics: list[int], users: list[int]) -> list[int]:
+        first = (Room.objects.order_by('-pk').values_list('pk', flat=True).first() or 0)
+        rooms = []
+        for i in range(count):
+            created = self.timestamp()
+            rooms.append(Room(
+                name=self.sentence(3), description=self.sentence(20),
+                topic_id=self.random.choice(topics), host_id=self.random.choice(users),
+                created_at=created, updated_at=created))
+        self.insert(Room, rooms, 'rooms')
+        return list(Room.objects.filter(pk__gt=first).values_list('pk', flat=True))
+
+    def seed_participants(self, rooms: list[int], users: list[int], per_room: int) -> None:
+        Participant = Room.participants.through
+        per_room = min(per_room, len(users))
+        self.insert(Participant, [
+            Participant(room_id=room, user_id=user)
+            for room in rooms for user in self.random.sample(users, per_room)
+        ], 'participants')
+
+    def seed_messages(self, count: int, rooms: list[int], users: list[int]) -> None:
+        # Built batch by batch so millions of rows never sit in memory.
+        started = time.perf_counter()
+        with explicit_timestamps(Message):
+            for start in range(0, count, self.batch_size):
+                batch = []
+                for i in range(min(self.batch_size, count - start)):
+                    created = self.timestamp()
+                    batch.append(Message(
+                        room_id=self.random.choice(rooms), user_id=self.random.choice(users),
+                        content=self.sentence(self.random.randint(3, 30)),
+                        created_at=created, updated_at=created))
+                with transaction.atomic():
+                    Message.objects.bulk_create(batch)
+        # Room activity follows the newest message, as it does for live posts.
+        latest = Message.objects.filter(room=OuterRef('pk')).order_by(
+            '-created_at').values('created_at')[:1]
+        Room.objects.filter(pk__in=rooms).update(
+            updated_at=Coalesce(Subquery(latest), F('created_at')))
+        self.report('messages', count, started)
@@ -0,0 +1,31 @@
+from django.db import IntegrityError, transaction
+
+from chatrooms.models import Message, Room
+
+Participant = Room.participants.through
+
+
+def post_message(room: Room, user, content: str,
+                 idempotency_key: str | None = None) -> tuple[Message, bool]:
+    """
+    Join ``user`` to ``room`` if needed and post ``content`` in one
+    transaction. Returns ``(message, created)``; a repeated
+    ``idempotency_key`` from the same user returns the original message.
+    """
+    idempotency_key = (idempotency_key or '')[:64] or None
+    try:
+        with transaction.atomic():
+            # Most posters already joined; skip add() and its signals then.
+            if not Participant.objects.filter(room_id=room.pk, user_id=user.pk).exists():
+                room.participants.add(user)
+            message = Message.objects.create(
+                room=room, user=user, content=content, idempotency_key=idempotency_key)
+    except IntegrityError as error:
+        if idempotency_key is None:
+            raise
+        try:
+            return Message.objects.get(user=user, idempotency_key=idempotency_key), False
+        except Message.DoesNotExist:
+            # Not a repeated key after all, or the original is gone since.
+            raise error from None
+    return message, True
@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field).annotate(total=Count('*')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def populate_counters(apps, schema_editor):
+    Room = apps.get_model('chatrooms', 'Room')
+    Topic = apps.get_model('chatrooms', 'Topic')
+    alias = schema_editor.connection.alias
+    Room.objects.using(alias).update(
+        participant_count=count_of(Room.participants.through.objects.using(alias), 'room'))
+    Topic.objects.using(alias).update(room_count=count_of(Room.objects.using(alias), 'topic'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatrooms', '0005_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,125 @@
+from django.db import migrations
+
+# SQLite FTS5 indexes kept in sync by triggers, so bulk writes and raw
+# updates are indexed too. Other backends fall back to icontains lookups
+# in chatrooms.search and skip this migration.
+
+FORWARD = [
+    """
+    CREATE VIRTUAL TABLE chatrooms_room_fts USING fts5(
+        name, topic, description,
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE chatrooms_topic_fts USING fts5(
+        name,
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE chatrooms_message_fts USING fts5(
+        content,
+        content='chatrooms_message', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+
+    """
+    CREATE TRIGGER chatrooms_room_fts_insert AFTER INSERT ON chatrooms_room BEGIN
+        INSERT INTO chatrooms_room_fts (rowid, name, topic, description)
+        VALUES (new.id, new.name,
+                (SELECT name FROM chatrooms_topic WHERE id = new.topic_id),
+                new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER chatrooms_room_fts_update
+    AFTER UPDATE OF name, description, topic_id ON chatrooms_room BEGIN
+        UPDATE chatrooms_room_fts
+        SET name = new.name,
+            topic = (SELECT name FROM chatrooms_topic WHERE id = new.topic_id),
+            description = new.description
+        WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER chatrooms_room_fts_delete AFTER DELETE ON chatrooms_room BEGIN
+        DELETE FROM chatrooms_room_fts WHERE rowid = old.id;
+    END
+    """,
+
+    """
+    CREATE TRIGGER chatrooms_topic_fts_insert AFTER INSERT ON chatrooms_topic BEGIN
+        INSERT INTO chatrooms_topic_fts (rowid, name) VALUES (new.id, new.name);
+    END
+    """,
+    """
+    CREATE TRIGGER chatrooms_topic_fts_update AFTER UPDATE OF name ON chatrooms_topic BEGIN
+        UPDATE chatrooms_topic_fts SET name = new.name WHERE rowid = old.id;
+        UPDATE chatrooms_room_fts SET topic = new.name
+        WHERE rowid IN (SELECT id FROM chatrooms_room WHERE topic_id = new.id);
+    END
+    """,
+    """
+    CREATE TRIGGER chatrooms_topic_fts_delete AFTER DELETE ON chatrooms_topic BEGIN
+        DELETE FROM chatrooms_topic_fts WHERE rowid = old.id;
+    END
+    """,
+
+    """
+    CREATE TRIGGER chatrooms_message_fts_insert AFTER INSERT ON chatrooms_message BEGIN
+        INSERT INTO chatrooms_message_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER chatrooms_message_fts_update AFTER UPDATE OF content ON chatrooms_message BEGIN
+        INSERT INTO chatrooms_message_fts (chatrooms_message_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+        INSERT INTO chatrooms_message_fts (rowid, content) VALUES (new.id, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER chatrooms_message_fts_delete AFTER DELETE ON chatrooms_message BEGIN
+        INSERT INTO chatrooms_message_fts (chatrooms_message_fts, rowid, content)
+        VALUES ('delete', old.id, old.content);
+    END
+    """,
+
+    """
+    INSERT INTO chatrooms_room_fts (rowid, name, topic, description)
+    SELECT room.id, room.name, topic.name, room.description
+    FROM chatrooms_room room JOIN chatrooms_topic topic ON topic.id = room.topic_id
+    """,
+    "INSERT INTO chatrooms_topic_fts (rowid, name) SELECT id, name FROM chatrooms_topic",
+    "INSERT INTO chatrooms_message_fts (chatrooms_message_fts) VALUES ('rebuild')",
+]
+
+BACKWARD = [
+    f'DROP TRIGGER IF EXISTS chatrooms_{model}_fts_{event}'
+    for model in ('room', 'topic', 'message')
+    for event in ('insert', 'update', 'delete')
+] + [
+    f'DROP TABLE IF EXISTS chatrooms_{model}_fts'
+    for model in ('room', 'topic', 'message')
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement, params=None)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatrooms', '0006_populate_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FORWARD), run(BACKWARD)),
+    ]
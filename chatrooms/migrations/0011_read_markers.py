@@ -0,0 +1,66 @@
+# Generated by Django 5.1.1 on 2026-10-18 16:12
+
+from importlib import import_module
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+full_text_search = import_module('chatrooms.migrations.0007_full_text_search')
+
+# Adding a column with a default makes SQLite rebuild chatrooms_room. The
+# rebuild fails on the topic trigger that reads chatrooms_room and drops the
+# room's own triggers, so they are dropped first and created again after;
+# row ids survive the rebuild, so the index itself stays valid. Removing the
+# column rebuilds the table too, hence the same steps when unapplying.
+TRIGGERS = ('chatrooms_room_fts_insert', 'chatrooms_room_fts_update',
+            'chatrooms_room_fts_delete', 'chatrooms_topic_fts_update')
+CREATE_TRIGGERS = [statement for statement in full_text_search.FORWARD
+                   if 'CREATE TRIGGER' in statement and statement.split()[2] in TRIGGERS]
+DROP_TRIGGERS = [f'DROP TRIGGER IF EXISTS {name}' for name in TRIGGERS]
+
+
+def populate_message_seq(apps, schema_editor):
+    Room = apps.get_model('chatrooms', 'Room')
+    Message = apps.get_model('chatrooms', 'Message')
+    alias = schema_editor.connection.alias
+    counts = Message.objects.using(alias).filter(room=OuterRef('pk')).order_by().values(
+        'room').annotate(total=Count('*')).values('total')
+    Room.objects.using(alias).update(
+        message_seq=Coalesce(Subquery(counts, output_field=models.IntegerField()), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatrooms', '0010_message_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(full_text_search.run(DROP_TRIGGERS),
+                             full_text_search.run(CREATE_TRIGGERS)),
+        migrations.AddField(
+            model_name='room',
+            name='message_seq',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(full_text_search.run(CREATE_TRIGGERS),
+                             full_text_search.run(DROP_TRIGGERS)),
+        migrations.RunPython(populate_message_seq, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='ReadMarker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_seq', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_markers', to='chatrooms.room')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_markers', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'room'), name='readmarker_user_room_uniq')],
+            },
+        ),
+    ]
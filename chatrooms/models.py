@@ -6,6 +6,7 @@ from django.core.validators import MinLengthValidator
 
 class Topic(models.Model):
     name = models.CharField(max_length=200, db_index=True)
+    room_count = models.PositiveIntegerField(default=0, db_index=True, editable=False)
 
     def __str__(self) -> str:
         return self.name
@@ -20,10 +21,28 @@ class Room(models.Model):
     host = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name="rooms")
     participants = models.ManyToManyField(settings.AUTH_USER_MODEL)
+    participant_count = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped by every new message; unread = message_seq - ReadMarker.last_read_seq.
+    message_seq = models.PositiveBigIntegerField(default=0, editable=False)
+    # The room record's id in the file it was imported from (import_ndjson).
+    import_key = models.CharField(max_length=255, null=True, blank=True, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['host', '-updated_at'],
+                         name='room_host_updated_idx'),
+            models.Index(fields=['-updated_at', '-id'],
+                         name='room_updated_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['import_key'],
+                                    condition=models.Q(import_key__isnull=False),
+                                    name='room_import_key_uniq'),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
@@ -36,9 +55,67 @@ class Message(models.Model):
                              on_delete=models.CASCADE, related_name='messages')
     room = models.ForeignKey(Room,
                              on_delete=models.CASCADE, related_name='messages')
+    # Client-generated token that makes re-submitted posts a no-op.
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True, editable=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'created_at', 'id'],
+                         name='message_room_created_idx'),
+            models.Index(fields=['user', 'created_at'],
+                         name='message_user_created_idx'),
+            models.Index(fields=['created_at'],
+                         name='message_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'],
+                                    condition=models.Q(idempotency_key__isnull=False),
+                                    name='message_user_idempotency_key_uniq'),
+        ]
+
     def __str__(self) -> str:
         return self.content[:50]
+
+
+class ReadMarker(models.Model):
+    """How far into a room's message sequence a user has read."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                             related_name='read_markers')
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='read_markers')
+    last_read_seq = models.PositiveBigIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'room'], name='readmarker_user_room_uniq'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user_id} read {self.room_id} up to {self.last_read_seq}'
+
+
+class MessageArchiveSegment(models.Model):
+    """
+    A run of old messages from one room, moved out of the hot ``Message``
+    table by ``archive_messages`` and stored as compressed JSON.
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='archive_segments')
+    message_count = models.PositiveIntegerField()
+    first_created_at = models.DateTimeField()
+    last_created_at = models.DateTimeField()
+    payload = models.BinaryField()
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', '-last_created_at', '-id'],
+                         name='archive_room_last_created_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.room_id}: {self.message_count} messages'
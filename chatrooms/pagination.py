@@ -0,0 +1,90 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Sequence
+
+from django.db.models import Q
+from django.db.models.query import QuerySet
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass
+class KeysetPage:
+    items: list = field(default_factory=list)
+    has_more: bool = False
+    cursor: Any = None
+
+
+def parse_cursor(value: Any) -> int | None:
+    try:
+        cursor = int(value)
+    except (TypeError, ValueError):
+        return None
+    return cursor if cursor > 0 else None
+
+
+def keyset_before(fields: Sequence[str], values: Sequence[Any]) -> Q:
+    # Row-value comparison (a, b) < (x, y) spelled out as
+    # a < x OR (a = x AND b < y) so the ORM can use a composite index.
+    condition = Q()
+    for index in range(len(fields) - 1, -1, -1):
+        step = Q(**{f'{fields[index]}__lt': values[index]})
+        step &= Q(**dict(zip(fields[:index], values[:index])))
+        condition = step if index == len(fields) - 1 else step | condition
+    return condition
+
+
+def format_keyset_cursor(moment: datetime, pk: int) -> str:
+    """
+    Cursor for the row at ``(moment, pk)``: its timestamp in microseconds
+    since the epoch and its pk. Carrying the values, rather than a pk to
+    look them up by, keeps the cursor valid when that row is later
+    updated or deleted.
+    """
+    return f'{(moment - EPOCH) // timedelta(microseconds=1)}_{pk}'
+
+
+def parse_keyset_cursor(value: Any) -> tuple[datetime, int] | None:
+    try:
+        micros, pk = (int(part) for part in str(value).split('_'))
+    except (TypeError, ValueError):
+        return None
+    if pk <= 0:
+        return None
+    try:
+        return EPOCH + timedelta(microseconds=micros), pk
+    except OverflowError:
+        return None
+
+
+def keyset_page(items: list, per_page: int, fields: Sequence[str]) -> KeysetPage:
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    cursor = (format_keyset_cursor(*(getattr(items[-1], name) for name in fields))
+              if has_more else None)
+    return KeysetPage(items=items, has_more=has_more, cursor=cursor)
+
+
+def keyset_paginate(queryset: QuerySet[Any], per_page: int,
+                    before: tuple[datetime, int] | None = None,
+                    fields: Sequence[str] = ('created_at', 'id')) -> KeysetPage:
+    """
+    Return up to ``per_page`` rows of ``queryset`` in descending ``fields``
+    order, a timestamp and then a unique id, starting strictly after the
+    ``before`` values taken from a ``parse_keyset_cursor`` cursor.
+    """
+    if before is not None:
+        queryset = queryset.filter(keyset_before(fields, before))
+    ordered = queryset.order_by(*[f'-{name}' for name in fields])
+    return keyset_page(list(ordered[:per_page + 1]), per_page, fields)
+
+
+async def akeyset_paginate(queryset: QuerySet[Any], per_page: int,
+                           before: tuple[datetime, int] | None = None,
+                           fields: Sequence[str] = ('created_at', 'id')) -> KeysetPage:
+    """Async counterpart of ``keyset_paginate`` for async views."""
+    if before is not None:
+        queryset = queryset.filter(keyset_before(fields, before))
+    ordered = queryset.order_by(*[f'-{name}' for name in fields])
+    return keyset_page([item async for item in ordered[:per_page + 1]], per_page, fields)
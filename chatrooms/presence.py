@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class BasePresence:
+    """
+    Who is in a room right now. Clients call ``heartbeat`` every so often
+    and count as online until ``ttl`` seconds after their last one.
+    """
+
+    def __init__(self, ttl: int = 60) -> None:
+        self.ttl = ttl
+
+    def heartbeat(self, room_id: int, user_id: int) -> None:
+        raise NotImplementedError
+
+    def leave(self, room_id: int, user_id: int) -> None:
+        raise NotImplementedError
+
+    def online(self, room_id: int) -> list[int]:
+        """Ids of the users online in ``room_id``."""
+        raise NotImplementedError
+
+    def counts(self, room_ids: list[int]) -> dict[int, int]:
+        """Number of users online in each of ``room_ids``."""
+        raise NotImplementedError
+
+
+class InMemoryPresence(BasePresence):
+    """
+    Presence for the current process. Every entry lives for the same
+    ``ttl``, so a room's users kept in order of their last heartbeat are
+    also in order of expiry: expired users are popped off the front when
+    a room is touched, and the rooms themselves are swept once per ``ttl``.
+    """
+
+    def __init__(self, ttl: int = 60) -> None:
+        super().__init__(ttl)
+        self.lock = threading.Lock()
+        self.rooms: dict[int, OrderedDict[int, float]] = {}
+        self.next_sweep = time.monotonic() + ttl
+
+    def expire(self, room_id: int, now: float) -> OrderedDict[int, float]:
+        users = self.rooms.get(room_id)
+        if users is None:
+            return OrderedDict()
+        while users and next(iter(users.values())) <= now:
+            users.popitem(last=False)
+        if not users:
+            del self.rooms[room_id]
+        return users
+
+    def heartbeat(self, room_id: int, user_id: int) -> None:
+        now = time.monotonic()
+        with self.lock:
+            users = self.rooms.setdefault(room_id, OrderedDict())
+            users[user_id] = now + self.ttl
+            users.move_to_end(user_id)
+            if now >= self.next_sweep:
+                # Rooms nobody asks about would otherwise keep their users.
+                self.next_sweep = now + self.ttl
+                for other in list(self.rooms):
+                    self.expire(other, now)
+
+    def leave(self, room_id: int, user_id: int) -> None:
+        with self.lock:
+            users = self.rooms.get(room_id)
+            if users is not None:
+                users.pop(user_id, None)
+                self.expire(room_id, time.monotonic())
+
+    def online(self, room_id: int) -> list[int]:
+        # Most recently seen first.
+        with self.lock:
+            return list(reversed(self.expire(room_id, time.monotonic())))
+
+    def counts(self, room_ids: list[int]) -> dict[int, int]:
+        now = time.monotonic()
+        with self.lock:
+            return {room_id: len(self.expire(room_id, now)) for room_id in room_ids}
+
+
+class CachePresence(BasePresence):
+    """
+    Presence kept in a shared cache so every worker sees the same users.
+    Each heartbeat refreshes one key per (room, user) that expires with
+    ``ttl``; a per-room index of user ids is rewritten at most once per
+    ``ttl`` for each user. Rewrites of the index are not atomic, so a user
+    lost in a race reappears with a later heartbeat.
+    """
+    prefix = 'chatrooms:presence'
+
+    def __init__(self, ttl: int = 60, alias: str = 'default') -> None:
+        super().__init__(ttl)
+        self.alias = alias
+
+    def user_key(self, room_id: int, user_id: int) -> str:
+        return f'{self.prefix}:{room_id}:{user_id}'
+
+    def index_key(self, room_id: int) -> str:
+        return f'{self.prefix}:{room_id}'
+
+    def heartbeat(self, room_id: int, user_id: int) -> None:
+        cache = caches[self.alias]
+        key = self.user_key(room_id, user_id)
+        now = time.time()
+        # The value is when the user was last written to the room index.
+        indexed = cache.get(key)
+        if indexed is None or now - indexed >= self.ttl:
+            index_key = self.index_key(room_id)
+            cache.set(index_key, cache.get(index_key, set()) | {user_id}, self.ttl * 2)
+            indexed = now
+        cache.set(key, indexed, self.ttl)
+
+    def leave(self, room_id: int, user_id: int) -> None:
+        caches[self.alias].delete(self.user_key(room_id, user_id))
+
+    def online(self, room_id: int) -> list[int]:
+        cache = caches[self.alias]
+        index_key = self.index_key(room_id)
+        user_ids = cache.get(index_key, set())
+        if not user_ids:
+            return []
+        present = cache.get_many([self.user_key(room_id, user_id) for user_id in user_ids])
+        online = [user_id for user_id in user_ids
+                  if self.user_key(room_id, user_id) in present]
+        if len(online) < len(user_ids):
+            # Drop expired users from the index while it is at hand.
+            cache.set(index_key, set(online), self.ttl * 2)
+        return online
+
+    def counts(self, room_ids: list[int]) -> dict[int, int]:
+        cache = caches[self.alias]
+        indexes = cache.get_many([self.index_key(room_id) for room_id in room_ids])
+        keys = {room_id: [self.user_key(room_id, user_id)
+                          for user_id in indexes.get(self.index_key(room_id), ())]
+                for room_id in room_ids}
+        present = cache.get_many([key for room_keys in keys.values() for key in room_keys])
+        return {room_id: sum(key in present for key in room_keys)
+                for room_id, room_keys in keys.items()}
+
+
+def attach_online_counts(rooms: list) -> list:
+    counts = get_presence().counts([room.pk for room in rooms])
+    for room in rooms:
+        room.online_count = counts[room.pk]
+    return rooms
+
+
+@lru_cache(maxsize=None)
+def get_presence() -> BasePresence:
+    options = getattr(settings, 'CHATROOMS_PRESENCE', {})
+    backend = import_string(options.get(
+        'BACKEND', 'chatrooms.presence.InMemoryPresence'))
+    return backend(**options.get('OPTIONS', {}))
+
+
+@receiver(setting_changed)
+def reset_presence(setting: str, **kwargs) -> None:
+    if setting == 'CHATROOMS_PRESENCE':
+        get_presence.cache_clear()
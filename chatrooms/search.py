@@ -0,0 +1,86 @@
+import re
+from typing import Any, Sequence
+
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, When
+from django.db.models.query import QuerySet
+
+# FTS5 tables maintained by triggers, see migration 0007_full_text_search.
+ROOM_INDEX = 'chatrooms_room_fts'
+TOPIC_INDEX = 'chatrooms_topic_fts'
+MESSAGE_INDEX = 'chatrooms_message_fts'
+
+# Column weights for bm25(): room name, topic name, description.
+ROOM_WEIGHTS = (10.0, 5.0, 1.0)
+
+SEARCH_LIMIT = 200
+
+token_pattern = re.compile(r'\w+', re.UNICODE)
+
+
+def uses_fts(queryset: QuerySet[Any]) -> bool:
+    return connections[queryset.db].vendor == 'sqlite'
+
+
+def match_expression(q: str) -> str | None:
+    """
+    Turn free text into an FTS5 query: every word must match, and the last
+    one is matched as a prefix so results follow the user's typing.
+    """
+    tokens = token_pattern.findall(q)
+    if not tokens:
+        return None
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def ranked_ids(queryset: QuerySet[Any], table: str, expression: str,
+               weights: Sequence[float] = (), limit: int = SEARCH_LIMIT) -> list[int]:
+    rank = f'bm25({table}, {", ".join(map(str, weights))})' if weights else 'rank'
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {table} WHERE {table} MATCH %s ORDER BY {rank} LIMIT %s',
+            [expression, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def in_rank_order(queryset: QuerySet[Any], ids: list[int]) -> QuerySet[Any]:
+    if not ids:
+        return queryset.none()
+    order = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)],
+                 output_field=IntegerField())
+    return queryset.filter(pk__in=ids).order_by(order)
+
+
+def search_rooms(queryset: QuerySet[Any], q: str) -> QuerySet[Any]:
+    if not q:
+        return queryset
+    if not uses_fts(queryset):
+        return queryset.filter(Q(name__icontains=q) | Q(topic__name__icontains=q))
+    expression = match_expression(q)
+    if expression is None:
+        return queryset.none()
+    return in_rank_order(queryset, ranked_ids(
+        queryset, ROOM_INDEX, expression, ROOM_WEIGHTS))
+
+
+def search_topics(queryset: QuerySet[Any], q: str) -> QuerySet[Any]:
+    if not q:
+        return queryset
+    if not uses_fts(queryset):
+        return queryset.filter(name__icontains=q)
+    expression = match_expression(q)
+    if expression is None:
+        return queryset.none()
+    return in_rank_order(queryset, ranked_ids(queryset, TOPIC_INDEX, expression))
+
+
+def search_messages(queryset: QuerySet[Any], q: str, limit: int) -> QuerySet[Any]:
+    if not uses_fts(queryset):
+        return queryset.filter(content__icontains=q).order_by('-created_at')[:limit]
+    expression = match_expression(q)
+    if expression is None:
+        return queryset.none()
+    return in_rank_order(queryset, ranked_ids(
+        queryset, MESSAGE_INDEX, expression, limit=limit))
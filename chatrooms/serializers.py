@@ -0,0 +1,35 @@
+import json
+from typing import Any
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from chatrooms.models import Message
+
+
+def serialize_message(message: Message) -> dict[str, Any]:
+    return {
+        'id': message.pk,
+        'room': message.room_id,
+        'user': {'id': message.user_id, 'username': message.user.username},
+        'content': message.content,
+        'created_at': message.created_at,
+    }
+
+
+MESSAGE_ROW_FIELDS = ('id', 'room_id', 'user_id',
+                      'user__username', 'content', 'created_at')
+
+
+def serialize_message_row(row: dict[str, Any]) -> dict[str, Any]:
+    """Same shape as ``serialize_message`` from a ``values()`` row."""
+    return {
+        'id': row['id'],
+        'room': row['room_id'],
+        'user': {'id': row['user_id'], 'username': row['user__username']},
+        'content': row['content'],
+        'created_at': row['created_at'],
+    }
+
+
+def dumps(data: Any) -> str:
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
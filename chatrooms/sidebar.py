@@ -0,0 +1,126 @@
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable
+
+from django.conf import settings
+from django.core.cache import caches
+
+from chatrooms.models import Message, Room, Topic
+
+# Blocks are grouped by what invalidates them: room and topic writes change
+# the topic list, message writes change the activity feed.
+TOPICS = 'topics'
+ACTIVITY = 'activity'
+
+
+class SidebarCache:
+    """
+    Caches the sidebar blocks under versioned keys. Writers bump a group's
+    version instead of deleting keys, so every process sharing the cache
+    backend moves to fresh entries at once and stale ones simply expire.
+    """
+    prefix = 'chatrooms:sidebar'
+
+    def __init__(self, alias: str = 'default', timeout: int = 300) -> None:
+        self.alias = alias
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.counters: Counter[str] = Counter()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def version_key(self, group: str) -> str:
+        return f'{self.prefix}:version:{group}'
+
+    def versions(self, *groups: str) -> dict[str, int]:
+        keys = {self.version_key(group): group for group in groups}
+        found = self.cache.get_many(keys)
+        versions = {keys[key]: value for key, value in found.items()}
+        for group in groups:
+            if group not in versions:
+                # A fresh, time-based version cannot collide with entries
+                # written before the version key was evicted.
+                versions[group] = time.time_ns()
+                self.cache.add(self.version_key(group), versions[group], None)
+        return versions
+
+    def bump(self, *groups: str) -> None:
+        for group in groups:
+            try:
+                self.cache.incr(self.version_key(group))
+            except ValueError:
+                self.cache.set(self.version_key(group), time.time_ns(), None)
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.counters[name] += 1
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {'hits': self.counters['hits'], 'misses': self.counters['misses']}
+
+    def get_blocks(self, blocks: dict[str, tuple[str, Callable[[], Any]]]) -> dict[str, Any]:
+        """
+        ``blocks`` maps a context name to ``(group, compute)``. Returns the
+        cached values, computing and storing only the missing ones.
+        """
+        versions = self.versions(*{group for group, compute in blocks.values()})
+        keys = {name: f'{self.prefix}:{versions[group]}:{name}'
+                for name, (group, compute) in blocks.items()}
+        found = self.cache.get_many(keys.values())
+
+        context, missing = {}, {}
+        for name, key in keys.items():
+            if key in found:
+                self.count('hits')
+                context[name] = found[key]
+            else:
+                self.count('misses')
+                context[name] = missing[key] = blocks[name][1]()
+        if missing:
+            self.cache.set_many(missing, self.timeout)
+        return context
+
+
+def top_topics() -> list[Topic]:
+    return list(Topic.objects.order_by('-room_count')[:6])
+
+
+def topic_count() -> int:
+    return Topic.objects.all().count()
+
+
+def room_total() -> int:
+    return Room.objects.all().count()
+
+
+def recent_messages(user=None) -> Callable[[], list[Message]]:
+    def compute() -> list[Message]:
+        queryset = Message.objects.all() if user is None else Message.objects.filter(user=user)
+        return list(queryset.select_related('user').select_related(
+            'room').order_by('-created_at')[:6])
+    return compute
+
+
+def get_sidebar_context(user=None) -> dict[str, Any]:
+    activity = 'recent_messages' if user is None else f'recent_messages:{user.pk}'
+    context = sidebar_cache.get_blocks({
+        'topics': (TOPICS, top_topics),
+        'topic_count': (TOPICS, topic_count),
+        'room_total': (TOPICS, room_total),
+        activity: (ACTIVITY, recent_messages(user)),
+    })
+    context['recent_messages'] = context.pop(activity)
+    return context
+
+
+def build_sidebar_cache() -> SidebarCache:
+    options = getattr(settings, 'CHATROOMS_SIDEBAR_CACHE', {})
+    return SidebarCache(alias=options.get('ALIAS', 'default'),
+                        timeout=options.get('TIMEOUT', 300))
+
+
+sidebar_cache = build_sidebar_cache()
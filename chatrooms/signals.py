@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DEFERRED, F
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_init, post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+
+from chatrooms.broker import get_broker
+from chatrooms.counters import adjust, rebuild_room_counts
+from chatrooms.models import Message, Room, Topic
+from chatrooms.serializers import dumps, serialize_message
+from chatrooms.sidebar import ACTIVITY, TOPICS, sidebar_cache
+
+
+@receiver(post_save, sender=Message)
+def publish_message(sender, instance: Message, created: bool, using: str, **kwargs) -> None:
+    if not created:
+        return
+    # Serialize once here so fan-out never touches the database.
+    payload = dumps(serialize_message(instance))
+    transaction.on_commit(
+        lambda: get_broker().publish(instance.room_id, payload), using=using)
+
+
+@receiver(post_save, sender=Message)
+def touch_room(sender, instance: Message, created: bool, using: str, **kwargs) -> None:
+    # Rooms are listed by recent activity, so a new message bumps its room,
+    # and unread counts are measured against its message sequence.
+    if created:
+        Room.objects.using(using).filter(pk=instance.room_id).update(
+            updated_at=instance.created_at, message_seq=F('message_seq') + 1)
+
+
+@receiver(m2m_changed, sender=Room.participants.through)
+def update_participant_count(sender, instance, action: str, reverse: bool,
+                             pk_set: set | None, using: str, **kwargs) -> None:
+    if action == 'post_add':
+        # Django only reports the ids that were actually inserted.
+        if reverse:
+            adjust(Room.objects.using(using).filter(pk__in=pk_set), 'participant_count', 1)
+        else:
+            adjust(Room.objects.using(using).filter(pk=instance.pk),
+                   'participant_count', len(pk_set))
+    elif action == 'pre_clear' and reverse:
+        instance._cleared_room_ids = list(Room.objects.using(using).filter(
+            participants=instance).values_list('pk', flat=True))
+    elif action in ('post_remove', 'post_clear'):
+        # Removals report the requested ids, not the deleted ones; recount.
+        if not reverse:
+            room_ids = [instance.pk]
+        elif action == 'post_remove':
+            room_ids = pk_set
+        else:
+            room_ids = instance.__dict__.pop('_cleared_room_ids', ())
+        rebuild_room_counts(Room, Room.objects.using(using).filter(pk__in=room_ids))
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def release_participations(sender, instance, using: str, **kwargs) -> None:
+    # The cascade removes join rows without sending m2m_changed.
+    adjust(Room.objects.using(using).filter(participants=instance), 'participant_count', -1)
+
+
+@receiver(post_init, sender=Room)
+def remember_topic(sender, instance: Room, **kwargs) -> None:
+    # Read the loaded value only; touching a deferred topic_id queries.
+    instance._saved_topic_id = instance.__dict__.get('topic_id', DEFERRED)
+
+
+@receiver(pre_save, sender=Room)
+def load_saved_topic(sender, instance: Room, using: str, **kwargs) -> None:
+    # A deferred topic that was assigned since: look up the one it replaces.
+    if instance._saved_topic_id is DEFERRED and 'topic_id' in instance.__dict__:
+        instance._saved_topic_id = Room.objects.using(using).filter(
+            pk=instance.pk).values_list('topic_id', flat=True).first()
+
+
+@receiver(post_save, sender=Room)
+def update_room_count(sender, instance: Room, created: bool, using: str, **kwargs) -> None:
+    previous = None if created else instance._saved_topic_id
+    if previous is DEFERRED:
+        # Never loaded, so never changed.
+        return
+    if previous != instance.topic_id:
+        adjust(Topic.objects.using(using).filter(pk=instance.topic_id), 'room_count', 1)
+        if previous is not None:
+            adjust(Topic.objects.using(using).filter(pk=previous), 'room_count', -1)
+    instance._saved_topic_id = instance.topic_id
+
+
+@receiver(pre_delete, sender=Room)
+def load_deleted_topic(sender, instance: Room, **kwargs) -> None:
+    if instance._saved_topic_id is DEFERRED:
+        instance._saved_topic_id = instance.topic_id
+
+
+@receiver(post_delete, sender=Room)
+def release_room_count(sender, instance: Room, using: str, **kwargs) -> None:
+    adjust(Topic.objects.using(using).filter(pk=instance._saved_topic_id), 'room_count', -1)
+
+
+def bump_sidebar(*groups: str):
+    # Bump after commit so no reader can cache pre-commit data under the
+    # new version.
+    def receiver(sender, using: str, **kwargs) -> None:
+        transaction.on_commit(lambda: sidebar_cache.bump(*groups), using=using)
+    return receiver
+
+
+for model, groups in ((Topic, (TOPICS,)), (Room, (TOPICS, ACTIVITY)), (Message, (ACTIVITY,))):
+    handler = bump_sidebar(*groups)
+    post_save.connect(handler, sender=model, weak=False,
+                      dispatch_uid=f'sidebar_save_{model.__name__}')
+    post_delete.connect(handler, sender=model, weak=False,
+                        dispatch_uid=f'sidebar_delete_{model.__name__}')
@@ -0,0 +1,74 @@
+import asyncio
+import re
+from typing import Any, AsyncIterator
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpRequest
+
+from chatrooms.broker import get_broker
+from chatrooms.models import Room
+
+KEEPALIVE_SECONDS = 15
+
+websocket_path = re.compile(r'^/rooms/(?P<pk>\d+)/ws/?$')
+
+
+def streaming_enabled(request: HttpRequest) -> bool:
+    """
+    Streams hold a connection for as long as a room is open, which would
+    tie up a WSGI worker each, so they are only served under ASGI. WSGI
+    pages poll ``room_messages`` instead.
+    """
+    return isinstance(request, ASGIRequest)
+
+
+async def room_events(room_id: int) -> AsyncIterator[str]:
+    """Server-Sent Events stream of new messages posted to ``room_id``."""
+    subscription = get_broker().subscribe(room_id)
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                payload = await asyncio.wait_for(
+                    subscription.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                # Comment lines keep proxies from closing an idle stream.
+                yield ': keepalive\n\n'
+                continue
+            yield f'event: message\ndata: {payload}\n\n'
+    finally:
+        subscription.close()
+
+
+async def websocket_application(scope: dict[str, Any], receive, send) -> None:
+    """
+    Minimal ASGI WebSocket handler: ``/rooms/<pk>/ws`` pushes every new
+    message in the room as a JSON text frame. Client frames are ignored.
+    """
+    match = websocket_path.match(scope['path'])
+    event = await receive()
+    if event['type'] != 'websocket.connect':
+        return
+    if match is None or not await Room.objects.filter(pk=match['pk']).aexists():
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+
+    await send({'type': 'websocket.accept'})
+    subscription = get_broker().subscribe(int(match['pk']))
+
+    async def forward() -> None:
+        async for payload in subscription:
+            await send({'type': 'websocket.send', 'text': payload})
+
+    async def wait_for_disconnect() -> None:
+        while (await receive())['type'] != 'websocket.disconnect':
+            pass
+
+    tasks = [asyncio.ensure_future(forward()),
+             asyncio.ensure_future(wait_for_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        subscription.close()
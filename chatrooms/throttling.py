@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from functools import lru_cache
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class BaseTokenBuckets:
+    def take(self, key: str, capacity: int, per_second: float) -> float:
+        """
+        Take a token from the bucket ``key``, which holds up to ``capacity``
+        tokens and refills at ``per_second``. Returns 0 when a token was
+        taken, otherwise the seconds until one will be available.
+        """
+        raise NotImplementedError
+
+    async def atake(self, key: str, capacity: int, per_second: float) -> float:
+        return await sync_to_async(self.take)(key, capacity, per_second)
+
+    @staticmethod
+    def refill(tokens: float, updated: float, now: float, capacity: int,
+               per_second: float) -> float:
+        return min(capacity, tokens + (now - updated) * per_second)
+
+
+class InMemoryTokenBuckets(BaseTokenBuckets):
+    """
+    Buckets held by the current process, so each worker enforces the limits
+    on its own. The least recently used buckets are dropped past
+    ``max_keys``; a dropped bucket comes back full.
+    """
+
+    def __init__(self, max_keys: int = 10_000) -> None:
+        self.max_keys = max_keys
+        self.lock = threading.Lock()
+        self.buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str, capacity: int, per_second: float) -> float:
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (capacity, now))
+            tokens = self.refill(tokens, updated, now, capacity, per_second)
+            allowed = tokens >= 1
+            self.buckets[key] = (tokens - allowed, now)
+            if len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return 0.0 if allowed else (1 - tokens) / per_second
+
+    async def atake(self, key: str, capacity: int, per_second: float) -> float:
+        return self.take(key, capacity, per_second)
+
+
+class CacheTokenBuckets(BaseTokenBuckets):
+    """
+    Buckets kept in a shared cache so every worker draws from the same
+    tokens. The read-modify-write is not atomic: workers racing on one
+    bucket may let a request or two through, never block one wrongly.
+    """
+    prefix = 'chatrooms:throttle'
+
+    def __init__(self, alias: str = 'default') -> None:
+        self.alias = alias
+
+    def take(self, key: str, capacity: int, per_second: float) -> float:
+        cache = caches[self.alias]
+        cache_key = f'{self.prefix}:{key}'
+        now = time.time()
+        tokens, updated = cache.get(cache_key, (capacity, now))
+        tokens = self.refill(tokens, updated, now, capacity, per_second)
+        allowed = tokens >= 1
+        # An untouched bucket is full again after capacity / per_second.
+        cache.set(cache_key, (tokens - allowed, now), int(capacity / per_second) + 1)
+        return 0.0 if allowed else (1 - tokens) / per_second
+
+
+class MessageThrottle:
+    """
+    Per-user and per-room token buckets in front of the message write path.
+    ``RATES`` maps ``'user'`` and ``'room'`` to ``(burst, per_second)``;
+    a scope without a rate is not limited.
+    """
+
+    def __init__(self, buckets: BaseTokenBuckets, rates: dict) -> None:
+        self.buckets = buckets
+        self.rates = rates
+        self.lock = threading.Lock()
+        self.counters: Counter[str] = Counter()
+
+    def keys(self, user_id: int, room_id: int) -> list[tuple[str, str]]:
+        return [(scope, f'{scope}:{ident}') for scope, ident
+                in (('user', user_id), ('room', room_id)) if scope in self.rates]
+
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.counters[name] += 1
+
+    def check(self, user_id: int, room_id: int) -> float:
+        """Return 0 to let the post through, else the seconds to wait."""
+        for scope, key in self.keys(user_id, room_id):
+            retry_after = self.buckets.take(key, *self.rates[scope])
+            if retry_after:
+                self.count(f'throttled_{scope}')
+                return retry_after
+        self.count('allowed')
+        return 0.0
+
+    async def acheck(self, user_id: int, room_id: int) -> float:
+        for scope, key in self.keys(user_id, room_id):
+            retry_after = await self.buckets.atake(key, *self.rates[scope])
+            if retry_after:
+                self.count(f'throttled_{scope}')
+                return retry_after
+        self.count('allowed')
+        return 0.0
+
+    def stats(self) -> dict[str, int]:
+        with self.lock:
+            return {name: self.counters[name]
+                    for name in ('allowed', 'throttled_user', 'throttled_room')}
+
+
+@lru_cache(maxsize=None)
+def get_message_throttle() -> MessageThrottle:
+    options = getattr(settings, 'CHATROOMS_MESSAGE_THROTTLE', {})
+    backend = import_string(options.get(
+        'BACKEND', 'chatrooms.throttling.InMemoryTokenBuckets'))
+    return MessageThrottle(backend(**options.get('OPTIONS', {})), options.get('RATES', {}))
+
+
+@receiver(setting_changed)
+def reset_message_throttle(setting: str, **kwargs) -> None:
+    if setting == 'CHATROOMS_MESSAGE_THROTTLE':
+        get_message_throttle.cache_clear()
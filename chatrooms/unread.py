@@ -0,0 +1,36 @@
+from django.utils import timezone
+
+from chatrooms.models import ReadMarker, Room
+
+
+def mark_read(user, room: Room) -> None:
+    """
+    Move ``user``'s marker in ``room`` up to its current message sequence.
+    Opening a room that has nothing new only reads the marker, and the
+    conditional update never moves a marker backwards when a slower
+    request loaded an older ``message_seq``.
+    """
+    markers = ReadMarker.objects.filter(user=user, room=room)
+    last_read_seq = markers.values_list('last_read_seq', flat=True).first()
+    if last_read_seq is None:
+        ReadMarker.objects.bulk_create(
+            [ReadMarker(user=user, room=room, last_read_seq=room.message_seq)],
+            ignore_conflicts=True)
+    elif last_read_seq < room.message_seq:
+        markers.filter(last_read_seq__lt=room.message_seq).update(
+            last_read_seq=room.message_seq, updated_at=timezone.now())
+
+
+def attach_unread_counts(user, rooms: list[Room]) -> list[Room]:
+    """
+    Set ``unread_count`` on each room ``user`` has opened before, from one
+    lookup on the (user, room) index. Rooms never opened get no count.
+    """
+    if not user.is_authenticated or not rooms:
+        return rooms
+    markers = dict(ReadMarker.objects.filter(
+        user=user, room__in=[room.pk for room in rooms]).values_list('room_id', 'last_read_seq'))
+    for room in rooms:
+        if room.pk in markers:
+            room.unread_count = max(room.message_seq - markers[room.pk], 0)
+    return rooms
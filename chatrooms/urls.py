@@ -1,22 +1,36 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth.views import LogoutView
 
 from . import views
 
-urlpatterns = [
-    path('', views.HomeView.as_view(), name="home"),
-    path('topics/', views.AllTopicsView.as_view(), name="all_topics"),
 
-    path('create-room/', views.CreateRoomView.as_view(), name="create_room"),
-    path('rooms/<int:pk>/edit', views.UpdateRoomView.as_view(), name="edit_room"),
-    path('rooms/<int:pk>/', views.RoomDetailView.as_view(), name="room_detail"),
-    path('rooms/<int:pk>/remove', views.DeleteRoomView.as_view(), name="delete_room"),
-    path('messages/<int:pk>/remove',
-         views.DeleteMessageView.as_view(), name="delete_message"),
+def build_urlpatterns(async_views: bool) -> list:
+    home_view = views.AsyncHomeView if async_views else views.HomeView
+    room_view = views.AsyncRoomDetailView if async_views else views.RoomDetailView
 
-    path('profile/<int:pk>', views.UserProfileView.as_view(), name="user_profile"),
+    return [
+        path('', home_view.as_view(), name="home"),
+        path('topics/', views.AllTopicsView.as_view(), name="all_topics"),
 
-    path('login/', views.LoginView.as_view(), name="login"),
-    path('register/', views.RegisterView.as_view(), name="register"),
-    path('logout/', view=LogoutView.as_view(), name="logout")
-]
+        path('create-room/', views.CreateRoomView.as_view(), name="create_room"),
+        path('rooms/<int:pk>/edit', views.UpdateRoomView.as_view(), name="edit_room"),
+        path('rooms/<int:pk>/', room_view.as_view(), name="room_detail"),
+        path('rooms/<int:pk>/stream', views.RoomEventStreamView.as_view(), name="room_stream"),
+        path('rooms/<int:pk>/messages', views.RoomMessagesSinceView.as_view(), name="room_messages"),
+        path('rooms/<int:pk>/presence', views.RoomPresenceView.as_view(), name="room_presence"),
+        path('rooms/<int:pk>/export', views.RoomExportView.as_view(), name="room_export"),
+        path('rooms/<int:pk>/remove', views.DeleteRoomView.as_view(), name="delete_room"),
+        path('messages/<int:pk>/remove',
+             views.DeleteMessageView.as_view(), name="delete_message"),
+
+        path('profile/<int:pk>', views.UserProfileView.as_view(), name="user_profile"),
+        path('profile/edit', views.EditProfileView.as_view(), name="edit_profile"),
+
+        path('login/', views.LoginView.as_view(), name="login"),
+        path('register/', views.RegisterView.as_view(), name="register"),
+        path('logout/', view=LogoutView.as_view(), name="logout")
+    ]
+
+
+urlpatterns = build_urlpatterns(getattr(settings, 'CHATROOMS_ASYNC_VIEWS', False))
@@ -1,17 +1,38 @@
+import asyncio
+import math
 from typing import Any
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models.query import QuerySet
 from django.forms import BaseModelForm
-from django.http import Http404, HttpRequest, HttpResponse
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.http.response import HttpResponseRedirect
 from django.shortcuts import redirect, render
 from django.views.generic import View, FormView, CreateView, UpdateView, ListView, DetailView, DeleteView
 from django.contrib.auth import authenticate, login, get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.db.models import Q, Count
-
-from chatrooms.forms import LoginForm, RegisterForm, RoomForm
+from django.db import transaction
+from django.core.exceptions import ValidationError
+
+from chatrooms.archive import archive_page, newest_segment
+from chatrooms.export import (FORMATS, atranscript_lines, atranscript_rows, transcript_lines,
+                              transcript_rows)
+from chatrooms.forms import AvatarForm, LoginForm, RegisterForm, RoomForm
+from chatrooms.messaging import post_message
 from chatrooms.models import Message, Room, Topic
+from chatrooms.pagination import (akeyset_paginate, keyset_paginate, parse_cursor,
+                                  parse_keyset_cursor)
+from chatrooms.presence import attach_online_counts, get_presence
+from chatrooms.search import search_messages, search_rooms, search_topics
+from chatrooms.serializers import MESSAGE_ROW_FIELDS, dumps, serialize_message_row
+from chatrooms.sidebar import get_sidebar_context
+from chatrooms.streaming import room_events, streaming_enabled
+from chatrooms.throttling import get_message_throttle
+from chatrooms.unread import attach_unread_counts, mark_read
+from core.avatars import save_avatar
 
 # Create your views here.
 User = get_user_model()
@@ -20,21 +41,44 @@ User = get_user_model()
 class HomeView(ListView):
     model = Room
     template_name = "chatrooms/home.html"
+    fragment_template_name = "chatrooms/includes/room_page.html"
     context_object_name = "rooms"
+    paginate_by = 20
+    message_results_limit = 10
 
     def get_queryset(self) -> QuerySet[Any]:
         queryset = super().get_queryset()
         q = self.request.GET.get('q') if self.request.GET.get('q') else ''
 
-        return queryset.filter(Q(name__icontains=q) | Q(topic__name__icontains=q)).annotate(participant_count=Count('participants')).select_related('topic').select_related('host')
+        return search_rooms(queryset, q).select_related('topic').select_related('host')
+
+    def get_template_names(self) -> list[str]:
+        if self.request.GET.get('fragment'):
+            return [self.fragment_template_name]
+        return super().get_template_names()
+
+    def paginate_queryset(self, queryset: QuerySet[Any], page_size: int) -> tuple:
+        if self.request.GET.get('q'):
+            # Search results arrive ranked and capped; show them as one page.
+            return (None, None, queryset, False)
+        page = keyset_paginate(queryset, per_page=page_size,
+                               before=parse_keyset_cursor(self.request.GET.get('before')),
+                               fields=('updated_at', 'id'))
+        return (None, page, page.items, page.has_more)
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        context['topics'] = Topic.objects.annotate(
-            room_count=Count('rooms')).order_by('-room_count')[:6]
-        context['topic_count'] = Topic.objects.all().count()
-        context['recent_messages'] = Message.objects.all().select_related(
-            'user').select_related('room').order_by('-created_at')[:6]
+        context['rooms'] = attach_online_counts(
+            attach_unread_counts(self.request.user, list(context['rooms'])))
+        if self.request.GET.get('fragment'):
+            return context
+        context.update(get_sidebar_context())
+        q = self.request.GET.get('q')
+        if q:
+            context['room_total'] = len(context['rooms'])
+            context['message_results'] = search_messages(
+                Message.objects.select_related('user').select_related('room'),
+                q, limit=self.message_results_limit)
         return context
 
 
@@ -47,7 +91,7 @@ class AllTopicsView(ListView):
         q = self.request.GET.get('q') if self.request.GET.get('q') else ''
         queryset = super().get_queryset()
 
-        return queryset.filter(Q(name__icontains=q)).annotate(room_count=Count('rooms'))
+        return search_topics(queryset, q)
 
 
 class CreateRoomView(LoginRequiredMixin, CreateView):
@@ -64,6 +108,7 @@ class CreateRoomView(LoginRequiredMixin, CreateView):
         context['topics'] = Topic.objects.all()
         return context
 
+    @transaction.atomic
     def form_valid(self, form: BaseModelForm) -> HttpResponse:
         data = form.cleaned_data
 
@@ -101,6 +146,7 @@ class UpdateRoomView(LoginRequiredMixin, UpdateView):
             raise Http404()
         return super().post(request, *args, **kwargs)
 
+    @transaction.atomic
     def form_valid(self, form: BaseModelForm) -> HttpResponse:
         data = form.cleaned_data
         topic, created = Topic.objects.get_or_create(
@@ -112,33 +158,299 @@ class UpdateRoomView(LoginRequiredMixin, UpdateView):
         return redirect('home')
 
 
+def idempotency_key_for(request: HttpRequest) -> str | None:
+    return request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key')
+
+
+def message_posted(request: HttpRequest, room: Room, message: Message | None,
+                   created: bool) -> HttpResponse:
+    """Post/redirect/get for forms, a small acknowledgement for scripts."""
+    if request.accepts('application/json') and not request.accepts('text/html'):
+        if message is None:
+            return JsonResponse({'error': 'content is required'}, status=400)
+        return JsonResponse({'id': message.pk, 'created': created},
+                            status=201 if created else 200)
+    return redirect('room_detail', pk=room.pk)
+
+
+def message_throttled(request: HttpRequest, retry_after: float) -> HttpResponse:
+    """Turn a throttled post away before it waits on the database."""
+    seconds = math.ceil(retry_after)
+    if request.accepts('application/json') and not request.accepts('text/html'):
+        response = JsonResponse({'error': 'too many messages', 'retry_after': seconds},
+                                status=429)
+    else:
+        response = HttpResponse('Too many messages, please slow down.', status=429,
+                                content_type='text/plain')
+    response['Retry-After'] = str(seconds)
+    return response
+
+
 class RoomDetailView(DetailView):
     template_name = "chatrooms/room_detail.html"
+    fragment_template_name = "chatrooms/includes/threads.html"
     model = Room
     context_object_name = "room"
+    messages_per_page = 50
 
     def get_queryset(self) -> QuerySet[Any]:
         return super().get_queryset().select_related('host')
 
+    def get_template_names(self) -> list[str]:
+        if self.request.GET.get('fragment'):
+            return [self.fragment_template_name]
+        return super().get_template_names()
+
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        context['room_messages'] = Message.objects.filter(
-            room=self.object).select_related('user').order_by('created_at')
+        archive = parse_cursor(self.request.GET.get('archive'))
+        if archive is not None:
+            page = archive_page(self.object, archive)
+            context['older_archive'] = page.cursor
+        else:
+            page = keyset_paginate(
+                Message.objects.filter(room=self.object).select_related('user'),
+                per_page=self.messages_per_page,
+                before=parse_keyset_cursor(self.request.GET.get('before')))
+            context['older_cursor'] = page.cursor
+            if not page.has_more:
+                # The hot table ran out; continue into the archived history.
+                context['older_archive'] = newest_segment(self.object).first()
+        # Pages are fetched newest first; threads read oldest to newest.
+        context['room_messages'] = page.items[::-1]
+        if self.request.GET.get('fragment'):
+            return context
+        if self.request.user.is_authenticated:
+            mark_read(self.request.user, self.object)
+            get_presence().heartbeat(self.object.pk, self.request.user.pk)
         context['participants'] = self.object.participants.all()
-        context['participant_count'] = self.object.participants.count()
+        context['online_ids'] = set(get_presence().online(self.object.pk))
+        context['participant_count'] = self.object.participant_count
+        context['idempotency_key'] = uuid4().hex
+        context['live_stream'] = streaming_enabled(self.request)
         return context
 
     def post(self, request, *args, **kwargs):
         if not request.user.is_authenticated:
             return redirect('login')
 
+        retry_after = get_message_throttle().check(request.user.pk, kwargs['pk'])
+        if retry_after:
+            return message_throttled(request, retry_after)
+
         room = self.get_object()
         content = request.POST.get('content')
+        message, created = None, False
         if content:
-            room.participants.add(request.user)
-            Message.objects.create(
-                room=room, user=request.user, content=content)
-        return self.get(request, *args, **kwargs)
+            message, created = post_message(
+                room, request.user, content, idempotency_key_for(request))
+        return message_posted(request, room, message, created)
+
+
+class RoomEventStreamView(View):
+    async def get(self, request: HttpRequest, pk: int) -> HttpResponse:
+        if not streaming_enabled(request):
+            # 204 tells EventSource to stop reconnecting.
+            return HttpResponse(status=204)
+        if not await Room.objects.filter(pk=pk).aexists():
+            raise Http404()
+        response = StreamingHttpResponse(
+            room_events(pk), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class RoomMessagesSinceView(View):
+    limit = 100
+
+    def get(self, request: HttpRequest, pk: int) -> HttpResponse:
+        after = parse_cursor(request.GET.get('after'))
+        queryset = Message.objects.filter(room_id=pk).values(*MESSAGE_ROW_FIELDS)
+        if after is None:
+            # First poll: start from the newest page instead of the beginning.
+            rows = list(queryset.order_by('-id')[:self.limit])[::-1]
+        else:
+            rows = list(queryset.filter(id__gt=after).order_by('id')[:self.limit])
+
+        if not rows:
+            # Only an empty answer needs to tell a quiet room from a missing one.
+            if not Room.objects.filter(pk=pk).exists():
+                raise Http404()
+            return HttpResponse(b'{"messages":[],"next":%d}' % (after or 0),
+                                content_type='application/json')
+        return HttpResponse(dumps({
+            'messages': [serialize_message_row(row) for row in rows],
+            'next': rows[-1]['id'],
+        }), content_type='application/json')
+
+
+class RoomPresenceView(View):
+    """
+    Who is online in a room. Clients POST a heartbeat while the room is
+    open (``leave=1`` when it closes); neither touches the database.
+    """
+
+    def get(self, request: HttpRequest, pk: int) -> HttpResponse:
+        online = get_presence().online(pk)
+        users = User.objects.filter(pk__in=online).in_bulk()
+        return JsonResponse({'count': len(online), 'online': [
+            {'id': user_id, 'username': users[user_id].username}
+            for user_id in online if user_id in users]})
+
+    def post(self, request: HttpRequest, pk: int) -> HttpResponse:
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'login required'}, status=403)
+        presence = get_presence()
+        if request.POST.get('leave'):
+            presence.leave(pk, request.user.pk)
+        else:
+            presence.heartbeat(pk, request.user.pk)
+        online = presence.online(pk)
+        return JsonResponse({'count': len(online), 'online': online, 'ttl': presence.ttl})
+
+
+class RoomExportView(LoginRequiredMixin, View):
+    """Streams a room transcript to its host or staff as NDJSON or CSV."""
+    login_url = "/login"
+    raise_exception = False
+
+    def get(self, request: HttpRequest, pk: int) -> HttpResponse:
+        room = Room.objects.filter(pk=pk).only('host_id').first()
+        if room is None or not (request.user.is_staff or request.user.pk == room.host_id):
+            raise Http404()
+        export_format = request.GET.get('format', 'ndjson')
+        if export_format not in FORMATS:
+            return HttpResponse(status=400)
+
+        after = parse_cursor(request.GET.get('after'))
+        if isinstance(request, ASGIRequest):
+            # ASGI reads a sync iterator into memory before sending it.
+            lines = atranscript_lines(atranscript_rows(pk, after=after), export_format)
+        else:
+            lines = transcript_lines(transcript_rows(pk, after=after), export_format)
+        response = StreamingHttpResponse(lines, content_type=FORMATS[export_format][0])
+        response['Content-Disposition'] = f'attachment; filename="room-{pk}.{export_format}"'
+        return response
+
+
+class AsyncHomeView(View):
+    """
+    Async twin of ``HomeView`` for ASGI deployments: the room page, the
+    sidebar and search results are fetched concurrently and the worker
+    thread is only held while the template renders.
+    """
+    template_name = HomeView.template_name
+    fragment_template_name = HomeView.fragment_template_name
+    paginate_by = HomeView.paginate_by
+    message_results_limit = HomeView.message_results_limit
+
+    async def get(self, request: HttpRequest) -> HttpResponse:
+        request.user = await request.auser()
+        q = request.GET.get('q') if request.GET.get('q') else ''
+        fragment = request.GET.get('fragment')
+        queryset = Room.objects.select_related('topic').select_related('host')
+
+        if q:
+            rooms = sync_to_async(lambda: list(search_rooms(queryset, q)))()
+        else:
+            rooms = akeyset_paginate(queryset, per_page=self.paginate_by,
+                                     before=parse_keyset_cursor(request.GET.get('before')),
+                                     fields=('updated_at', 'id'))
+        tasks = {'rooms': rooms}
+        if not fragment:
+            tasks['sidebar'] = sync_to_async(get_sidebar_context)()
+            if q:
+                tasks['message_results'] = sync_to_async(lambda: list(search_messages(
+                    Message.objects.select_related('user').select_related('room'),
+                    q, limit=self.message_results_limit)))()
+        results = dict(zip(tasks, await asyncio.gather(*tasks.values())))
+
+        if q:
+            context = {'rooms': results['rooms'], 'page_obj': None, 'is_paginated': False}
+        else:
+            page = results['rooms']
+            context = {'rooms': page.items, 'page_obj': page, 'is_paginated': page.has_more}
+        context['rooms'] = attach_online_counts(
+            await sync_to_async(attach_unread_counts)(request.user, context['rooms']))
+        if not fragment:
+            context.update(results['sidebar'])
+            if q:
+                context['room_total'] = len(context['rooms'])
+                context['message_results'] = results['message_results']
+        template = self.fragment_template_name if fragment else self.template_name
+        return await sync_to_async(render)(request, template, context)
+
+
+class AsyncRoomDetailView(View):
+    """Async twin of ``RoomDetailView``, including the message-post path."""
+    template_name = RoomDetailView.template_name
+    fragment_template_name = RoomDetailView.fragment_template_name
+    messages_per_page = RoomDetailView.messages_per_page
+
+    async def get_room(self, pk: int) -> Room:
+        try:
+            return await Room.objects.select_related('host').select_related('topic').aget(pk=pk)
+        except Room.DoesNotExist:
+            raise Http404()
+
+    async def get(self, request: HttpRequest, pk: int) -> HttpResponse:
+        request.user = await request.auser()
+        fragment = request.GET.get('fragment')
+        room = await self.get_room(pk)
+
+        tasks = [self.history(room, request)]
+        if not fragment:
+            tasks.append(self.participants(room))
+            if request.user.is_authenticated:
+                tasks.append(sync_to_async(mark_read)(request.user, room))
+                get_presence().heartbeat(room.pk, request.user.pk)
+        history, *participants = await asyncio.gather(*tasks)
+
+        context = {'room': room, 'object': room, **history}
+        if not fragment:
+            context['participants'] = participants[0]
+            context['online_ids'] = set(get_presence().online(room.pk))
+            context['participant_count'] = room.participant_count
+            context['idempotency_key'] = uuid4().hex
+            context['live_stream'] = streaming_enabled(request)
+        template = self.fragment_template_name if fragment else self.template_name
+        return await sync_to_async(render)(request, template, context)
+
+    async def history(self, room: Room, request: HttpRequest) -> dict[str, Any]:
+        archive = parse_cursor(request.GET.get('archive'))
+        if archive is not None:
+            page = await sync_to_async(archive_page)(room, archive)
+            return {'room_messages': page.items[::-1], 'older_archive': page.cursor}
+
+        page = await akeyset_paginate(
+            Message.objects.filter(room=room).select_related('user'),
+            per_page=self.messages_per_page,
+            before=parse_keyset_cursor(request.GET.get('before')))
+        history = {'room_messages': page.items[::-1], 'older_cursor': page.cursor}
+        if not page.has_more:
+            history['older_archive'] = await newest_segment(room).afirst()
+        return history
+
+    async def participants(self, room: Room) -> list:
+        return [participant async for participant in room.participants.all()]
+
+    async def post(self, request: HttpRequest, pk: int) -> HttpResponse:
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect('login')
+
+        retry_after = await get_message_throttle().acheck(user.pk, pk)
+        if retry_after:
+            return message_throttled(request, retry_after)
+
+        room = await self.get_room(pk)
+        content = request.POST.get('content')
+        message, created = None, False
+        if content:
+            message, created = await sync_to_async(post_message)(
+                room, user, content, idempotency_key_for(request))
+        return message_posted(request, room, message, created)
 
 
 class DeleteRoomView(LoginRequiredMixin, DeleteView):
@@ -194,17 +506,29 @@ class UserProfileView(DetailView):
         context = super().get_context_data(**kwargs)
         user = self.object
 
-        context['rooms'] = user.rooms.all().annotate(participant_count=Count(
-            'participants')).select_related('topic').select_related('host')
-        context['topics'] = Topic.objects.annotate(
-            room_count=Count('rooms')).order_by('-room_count')[:6]
-        context['topic_count'] = Topic.objects.all().count()
-        context['recent_messages'] = Message.objects.filter(
-            user=user).select_related('user').select_related('room').order_by('-created_at')[:6]
+        context['rooms'] = user.rooms.all().select_related(
+            'topic').select_related('host').order_by('-updated_at')
+        context.update(get_sidebar_context(user=user))
 
         return context
 
 
+class EditProfileView(LoginRequiredMixin, FormView):
+    login_url = "/login"
+    raise_exception = False
+
+    form_class = AvatarForm
+    template_name = "chatrooms/edit_profile.html"
+
+    def form_valid(self, form: AvatarForm) -> HttpResponse:
+        try:
+            save_avatar(self.request.user, form.cleaned_data['avatar'])
+        except ValidationError as error:
+            form.add_error('avatar', error)
+            return self.form_invalid(form)
+        return redirect('user_profile', pk=self.request.user.pk)
+
+
 class LoginView(FormView):
     form_class = LoginForm
     template_name = "chatrooms/login.html"
@@ -0,0 +1,110 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+
+class UserCache:
+    """
+    Users by primary key for the current process, dropped ``ttl`` seconds
+    after they were loaded and least recently used first past
+    ``max_users``. Each entry remembers the user's version in the shared
+    ``version_cache``; saving or deleting a user bumps that version, so
+    every process drops its copy on the next lookup. Without a
+    ``version_cache`` other processes, and ``QuerySet.update()`` anywhere,
+    wait out the TTL.
+    """
+    prefix = 'core:auth:user'
+
+    def __init__(self, ttl: int = 60, max_users: int = 10_000,
+                 version_cache: str | None = None) -> None:
+        self.ttl = ttl
+        self.max_users = max_users
+        self.version_cache = version_cache
+        self.lock = threading.Lock()
+        self.users: OrderedDict = OrderedDict()
+
+    def version(self, user_id) -> int:
+        if self.version_cache is None:
+            return 0
+        return caches[self.version_cache].get(f'{self.prefix}:{user_id}', 0)
+
+    def get(self, user_id):
+        version = self.version(user_id)
+        with self.lock:
+            user, expires, loaded_version = self.users.get(user_id, (None, 0.0, 0))
+            if user is None:
+                return None
+            if expires <= time.monotonic() or loaded_version != version:
+                del self.users[user_id]
+                return None
+            self.users.move_to_end(user_id)
+        # Requests get their own copy, so changes to one never leak into another.
+        return copy.copy(user)
+
+    def set(self, user, version: int = 0) -> None:
+        """Cache ``user``, loaded while its version was ``version``."""
+        with self.lock:
+            self.users[user.pk] = (copy.copy(user), time.monotonic() + self.ttl, version)
+            self.users.move_to_end(user.pk)
+            if len(self.users) > self.max_users:
+                self.users.popitem(last=False)
+
+    def invalidate(self, user_id) -> None:
+        with self.lock:
+            self.users.pop(user_id, None)
+        if self.version_cache is not None:
+            cache = caches[self.version_cache]
+            key = f'{self.prefix}:{user_id}'
+            cache.add(key, 0, None)
+            cache.incr(key)
+
+
+@lru_cache(maxsize=None)
+def get_user_cache() -> UserCache:
+    options = getattr(settings, 'AUTH_USER_CACHE', {})
+    return UserCache(ttl=options.get('TTL', 60), max_users=options.get('MAX_USERS', 10_000),
+                     version_cache=options.get('VERSION_CACHE'))
+
+
+@receiver(setting_changed)
+def reset_user_cache(setting: str, **kwargs) -> None:
+    if setting == 'AUTH_USER_CACHE':
+        get_user_cache.cache_clear()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, **kwargs) -> None:
+    get_user_cache().invalidate(instance.pk)
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ``ModelBackend`` that serves the user behind a session from
+    ``UserCache``, so authenticated requests skip the user query. A stale
+    user would fail Django's session hash check after a password change
+    and flush the session, hence the shared versions.
+    """
+
+    def get_user(self, user_id):
+        user_id = get_user_model()._meta.pk.to_python(user_id)
+        cache = get_user_cache()
+        user = cache.get(user_id)
+        if user is None:
+            # Read the version first: a save landing after it makes the
+            # entry stale rather than passing an old user off as current.
+            version = cache.version(user_id)
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(user, version)
+        return user
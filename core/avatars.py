@@ -0,0 +1,71 @@
+import hashlib
+import io
+import zlib
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - optional dependency
+    Image = ImageOps = None
+
+# Rendered CSS sizes (.avatar--small/medium/large) doubled for dense screens.
+AVATAR_SIZES = {'small': 56, 'medium': 72, 'large': 160}
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+DEFAULT_COLORS = ('#71c6dd', '#5dd693', '#f0a04b', '#e06c75',
+                  '#c678dd', '#56b6c2', '#d19a66', '#98c379')
+
+
+def thumbnail_name(digest: str, size: str) -> str:
+    return f'avatars/{digest}-{AVATAR_SIZES[size]}.jpg'
+
+
+def render_thumbnails(content: bytes) -> dict[str, bytes]:
+    if Image is None:
+        raise ValidationError("Avatar uploads need the Pillow package installed.")
+    try:
+        image = Image.open(io.BytesIO(content))
+        image.load()
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError("Upload a valid image.")
+
+    image = ImageOps.exif_transpose(image).convert('RGB')
+    thumbnails = {}
+    for size, pixels in AVATAR_SIZES.items():
+        output = io.BytesIO()
+        ImageOps.fit(image, (pixels, pixels), Image.LANCZOS).save(
+            output, 'JPEG', quality=85, optimize=True)
+        thumbnails[size] = output.getvalue()
+    return thumbnails
+
+
+def save_avatar(user, upload) -> None:
+    """
+    Resize an uploaded image once into every size in ``AVATAR_SIZES``.
+    Files are named after the upload's hash, so their URLs change with the
+    content and can be cached indefinitely.
+    """
+    if upload.size > MAX_UPLOAD_BYTES:
+        raise ValidationError("Avatars must be 5 MB or smaller.")
+    content = upload.read()
+    thumbnails = render_thumbnails(content)
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    for size, body in thumbnails.items():
+        name = thumbnail_name(digest, size)
+        if not default_storage.exists(name):
+            default_storage.save(name, ContentFile(body))
+    user.avatar.name = thumbnail_name(digest, 'large')
+    user.save(update_fields=['avatar'])
+
+
+def avatar_url(user, size: str = 'small') -> str:
+    if user.avatar:
+        digest = user.avatar.name.removeprefix('avatars/').partition('-')[0]
+        return default_storage.url(thumbnail_name(digest, size))
+    # Users without an upload share a handful of generated images.
+    initial = (user.username[:1] or '?').upper()
+    color = zlib.crc32(user.username.encode()) % len(DEFAULT_COLORS)
+    return reverse('default_avatar', kwargs={'initial': initial, 'color': color})
@@ -0,0 +1,35 @@
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SVG_NS = 'http://www.w3.org/2000/svg'
+
+
+class Command(BaseCommand):
+    help = ("Combine the icons in static/images/icons/ into one SVG sprite of "
+            "<symbol> elements, referenced from templates with <use>.")
+
+    def add_arguments(self, parser):
+        static = Path(settings.BASE_DIR) / 'static' / 'images'
+        parser.add_argument('--source', default=static / 'icons', type=Path)
+        parser.add_argument('--output', default=static / 'icons.svg', type=Path)
+
+    def handle(self, *args, **options):
+        icons = sorted(options['source'].glob('*.svg'))
+        if not icons:
+            raise CommandError(f"No icons found in {options['source']}.")
+
+        ET.register_namespace('', SVG_NS)
+        sprite = ET.Element(f'{{{SVG_NS}}}svg')
+        for icon in icons:
+            source = ET.parse(icon).getroot()
+            symbol = ET.SubElement(sprite, f'{{{SVG_NS}}}symbol', id=icon.stem,
+                                   viewBox=source.get('viewBox'))
+            # Titles are added where the icon is used.
+            symbol.extend(child for child in source if child.tag != f'{{{SVG_NS}}}title')
+
+        options['output'].write_text(ET.tostring(sprite, encoding='unicode') + '\n')
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(icons)} icons to {options['output']}."))
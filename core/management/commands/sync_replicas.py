@@ -0,0 +1,29 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = ("Copy the primary SQLite database into each SQLite replica in "
+            "DATABASE_REPLICAS. Stands in for replication when testing the "
+            "read/write router locally.")
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError("sync_replicas only copies SQLite databases.")
+        primary.ensure_connection()
+        for alias in getattr(settings, 'DATABASE_REPLICAS', {}):
+            replica = connections[alias]
+            if replica.vendor != 'sqlite':
+                self.stderr.write(f"Skipping {alias}: not SQLite.")
+                continue
+            replica.close()
+            target = sqlite3.connect(replica.settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(self.style.SUCCESS(f"Synced {alias}."))
@@ -0,0 +1,153 @@
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger('core.metrics')
+
+# Literal lists such as IN (%s, %s, %s) collapse to one shape whatever their length.
+placeholder_list = re.compile(r'\((?:%s|\?)(?:\s*,\s*(?:%s|\?))*\)')
+
+
+def query_shape(sql: str) -> str:
+    return placeholder_list.sub('(...)', sql)
+
+
+@dataclass
+class RequestMetrics:
+    started: float = field(default_factory=time.perf_counter)
+    queries: int = 0
+    db_time: float = 0.0
+    view_started: float | None = None
+    view_finished: float | None = None
+    shapes: Counter = field(default_factory=Counter)
+
+    def record_query(self, sql: str, duration: float) -> None:
+        self.queries += 1
+        self.db_time += duration
+        self.shapes[query_shape(sql)] += 1
+
+
+current_metrics: ContextVar[RequestMetrics | None] = ContextVar(
+    'current_metrics', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every connection. Does nothing unless the
+    current request is being sampled; the context variable follows the
+    request across sync_to_async threads.
+    """
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record_query(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs) -> None:
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records query count, database time, view time and template render time
+    for a sample of requests. Results go out as a ``Server-Timing`` header
+    and a JSON log line on the ``core.metrics`` logger; SQL shapes repeated
+    within one request (the usual N+1 signature) are logged as warnings.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        options = getattr(settings, 'REQUEST_METRICS', {})
+        self.sample_rate = options.get('SAMPLE_RATE', 1.0)
+        self.repeat_threshold = options.get('REPEATED_QUERY_THRESHOLD', 5)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = self.start(request)
+        if metrics is None:
+            return self.get_response(request)
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = self.start(request)
+        if metrics is None:
+            return await self.get_response(request)
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def start(self, request) -> RequestMetrics | None:
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return None
+        request.metrics = RequestMetrics()
+        return request.metrics
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = getattr(request, 'metrics', None)
+        if metrics is not None:
+            metrics.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Called after the view returns and before the template is rendered.
+        metrics = getattr(request, 'metrics', None)
+        if metrics is not None:
+            metrics.view_finished = time.perf_counter()
+        return response
+
+    def finish(self, request, response, metrics: RequestMetrics):
+        finished = time.perf_counter()
+        view_started = metrics.view_started or metrics.started
+        view_finished = metrics.view_finished or finished
+        timings = {
+            'total': finished - metrics.started,
+            'db': metrics.db_time,
+            'view': view_finished - view_started,
+            'render': finished - view_finished if metrics.view_finished else 0.0,
+        }
+        response['Server-Timing'] = ', '.join(
+            f'{name};dur={duration * 1000:.2f}'
+            + (f';desc="{metrics.queries} queries"' if name == 'db' else '')
+            for name, duration in timings.items())
+
+        repeated = {shape: count for shape, count in metrics.shapes.items()
+                    if count >= self.repeat_threshold}
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'repeated_queries': len(repeated),
+            **{f'{name}_ms': round(duration * 1000, 2) for name, duration in timings.items()},
+        }))
+        for shape, count in repeated.items():
+            logger.warning(json.dumps({
+                'event': 'repeated_query', 'path': request.path,
+                'count': count, 'sql': shape,
+            }))
+        return response
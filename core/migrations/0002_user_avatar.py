@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 16:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar',
+            field=models.FileField(blank=True, editable=False, upload_to='avatars/'),
+        ),
+    ]
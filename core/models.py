@@ -5,4 +5,6 @@ from django.contrib.auth.models import AbstractUser
 
 
 class User(AbstractUser):
-    pass
+    # The largest thumbnail written by core.avatars.save_avatar; the other
+    # sizes sit next to it under the same content hash.
+    avatar = models.FileField(upload_to='avatars/', blank=True, editable=False)
@@ -0,0 +1,108 @@
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Set for the rest of a request once it has written, or when the client
+# wrote within the last REPLICA_PIN_SECONDS (tracked by a cookie).
+pinned_to_primary: ContextVar[bool] = ContextVar('pinned_to_primary', default=False)
+wrote_to_primary: ContextVar[bool] = ContextVar('wrote_to_primary', default=False)
+
+PIN_COOKIE = 'primary_pin'
+
+
+def replica_weights() -> dict[str, int]:
+    return {alias: weight for alias, weight in getattr(settings, 'DATABASE_REPLICAS', {}).items()
+            if weight > 0}
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends writes to the default database and spreads reads over the
+    replicas in ``DATABASE_REPLICAS`` (alias -> weight). Reads stay on the
+    primary inside a transaction, after the current request wrote, and for
+    a short window after the same client's last write, so users always see
+    their own messages.
+    """
+
+    def db_for_read(self, model, **hints) -> str:
+        if pinned_to_primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        weights = replica_weights()
+        if not weights:
+            return DEFAULT_DB_ALIAS
+        return random.choices(list(weights), weights=list(weights.values()))[0]
+
+    def db_for_write(self, model, **hints) -> str:
+        instance = hints.get('instance')
+        db = instance._state.db if instance is not None else None
+        replicas = getattr(settings, 'DATABASE_REPLICAS', {})
+        if db is not None and db != DEFAULT_DB_ALIAS and db not in replicas:
+            # Objects from other databases, such as benchmark_sqlite's
+            # scratch aliases, are written back where they came from.
+            return db
+        pinned_to_primary.set(True)
+        wrote_to_primary.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # Replicas hold the same data as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> bool | None:
+        # Replicas get their schema with the data, see sync_replicas. Any
+        # other alias is left to Django's default.
+        if db in getattr(settings, 'DATABASE_REPLICAS', {}):
+            return False
+        return None
+
+
+class PrimaryPinningMiddleware:
+    """
+    Scopes the router's pinning state to one request and keeps a client
+    pinned to the primary for ``REPLICA_PIN_SECONDS`` after it writes.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tokens = self.start(request)
+        try:
+            return self.finish(self.get_response(request))
+        finally:
+            self.reset(tokens)
+
+    async def __acall__(self, request):
+        tokens = self.start(request)
+        try:
+            return self.finish(await self.get_response(request))
+        finally:
+            self.reset(tokens)
+
+    def start(self, request) -> tuple:
+        try:
+            pinned = float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            pinned = False
+        return pinned_to_primary.set(pinned), wrote_to_primary.set(False)
+
+    def finish(self, response):
+        if wrote_to_primary.get():
+            seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+            response.set_cookie(PIN_COOKIE, str(time.time() + seconds),
+                                max_age=seconds, httponly=True, samesite='Lax')
+        return response
+
+    def reset(self, tokens: tuple) -> None:
+        pinned_to_primary.reset(tokens[0])
+        wrote_to_primary.reset(tokens[1])
@@ -0,0 +1,43 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg')
+
+
+def compressed_variants(content: bytes) -> dict[str, bytes]:
+    """Precompressed bodies by file suffix; brotli only when installed."""
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(content)
+    return variants
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Content-hashed file names, plus a .gz (and .br with the ``brotli``
+    package) next to every hashed CSS, JS and SVG file, written once by
+    collectstatic so nothing is compressed per request.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if not dry_run and isinstance(hashed_name, str) and hashed_name.endswith(COMPRESSIBLE):
+                self.compress(hashed_name)
+            yield name, hashed_name, processed
+
+    def compress(self, name: str) -> None:
+        with self.open(name) as original:
+            content = original.read()
+        for suffix, body in compressed_variants(content).items():
+            # Tiny files can grow when compressed.
+            if len(body) < len(content):
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(body))
@@ -0,0 +1,10 @@
+from django import template
+
+from core import avatars
+
+register = template.Library()
+
+
+@register.filter
+def avatar_url(user, size: str = 'small') -> str:
+    return avatars.avatar_url(user, size)
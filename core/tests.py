@@ -1,3 +1,293 @@
-from django.test import TestCase
+import io
+import tempfile
+import time
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+
+from core import avatars
+from core.auth import UserCache, get_user_cache
+from core.avatars import avatar_url
+from core.middleware import query_shape
+from core.routers import PIN_COOKIE, PrimaryPinningMiddleware, PrimaryReplicaRouter, pinned_to_primary
+from core.views import serve_static
+from studybuddy.sqlite import sqlite_database
+
+User = get_user_model()
+
+
+def whoami(request):
+    return HttpResponse(request.user.get_username() or 'anonymous')
+
+
+def list_usernames(request):
+    # Deliberate N+1: one query per user.
+    names = [User.objects.get(pk=pk).username for pk in User.objects.values_list('pk', flat=True)]
+    return HttpResponse(','.join(names))
+
+
+urlpatterns = [
+    path('whoami/', whoami),
+    path('users/', list_usernames),
+    path('static/<path:path>', serve_static),
+]
+
+
+@override_settings(ROOT_URLCONF='core.tests')
+class RequestMetricsMiddlewareTests(TestCase):
+    def test_server_timing_header(self):
+        User.objects.create_user('alice')
+        response = self.client.get('/users/')
+        timing = response['Server-Timing']
+        for name in ('total', 'db', 'view', 'render'):
+            self.assertIn(f'{name};dur=', timing)
+        self.assertIn('desc="2 queries"', timing)
+
+    def test_repeated_queries_are_flagged(self):
+        for index in range(6):
+            User.objects.create_user(f'user{index}')
+        with self.assertLogs('core.metrics', level='WARNING') as logs:
+            self.client.get('/users/')
+        self.assertIn('"count": 6', logs.output[0])
+
+    def test_query_shape_collapses_in_lists(self):
+        self.assertEqual(query_shape('SELECT 1 WHERE id IN (%s, %s, %s)'),
+                         query_shape('SELECT 1 WHERE id IN (%s)'))
+
+
+@override_settings(DATABASE_REPLICAS={'replica1': 3, 'replica2': 1, 'replica3': 0})
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    # No wrapping transaction: it would pin every read to the primary.
+    databases = {'default'}
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.token = pinned_to_primary.set(False)
+
+    def tearDown(self):
+        pinned_to_primary.reset(self.token)
+
+    def test_reads_use_weighted_replicas(self):
+        with mock.patch('core.routers.random.choices', return_value=['replica2']) as choices:
+            self.assertEqual(self.router.db_for_read(User), 'replica2')
+        choices.assert_called_once_with(['replica1', 'replica2'], weights=[3, 1])
+
+    def test_reads_stay_on_primary_after_a_write(self):
+        self.assertEqual(self.router.db_for_write(User), 'default')
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_reads_stay_on_primary_in_a_transaction(self):
+        with transaction.atomic():
+            self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_writes_follow_instances_from_other_databases(self):
+        user = User(pk=1)
+        user._state.db = 'scratch'
+        self.assertEqual(self.router.db_for_write(User, instance=user), 'scratch')
+        user._state.db = 'replica1'
+        self.assertEqual(self.router.db_for_write(User, instance=user), 'default')
+
+    def test_only_replicas_skip_migrations(self):
+        self.assertFalse(self.router.allow_migrate('replica1', 'chatrooms'))
+        self.assertIsNone(self.router.allow_migrate('default', 'chatrooms'))
+        self.assertIsNone(self.router.allow_migrate('scratch', 'chatrooms'))
+
+
+class PrimaryPinningMiddlewareTests(TestCase):
+    def test_write_pins_the_client(self):
+        def write(request):
+            PrimaryReplicaRouter().db_for_write(User)
+            return HttpResponse()
+
+        token = pinned_to_primary.set(False)
+        self.addCleanup(pinned_to_primary.reset, token)
+        request = RequestFactory().get('/')
+        response = PrimaryPinningMiddleware(write)(request)
+        self.assertGreater(float(response.cookies[PIN_COOKIE].value), time.time())
+        self.assertFalse(pinned_to_primary.get())
+
+        def read(request):
+            self.assertTrue(pinned_to_primary.get())
+            return HttpResponse()
+
+        request.COOKIES[PIN_COOKIE] = response.cookies[PIN_COOKIE].value
+        response = PrimaryPinningMiddleware(read)(request)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+@override_settings(ROOT_URLCONF='core.tests')
+class AuthCacheTests(TestCase):
+    def setUp(self):
+        # Two workers: separate cache clients on one shared directory.
+        directory = self.enterContext(tempfile.TemporaryDirectory())
+        shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                  'LOCATION': directory}
+        self.enterContext(override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'shared': shared, 'worker2': shared}))
+        get_user_cache.cache_clear()
+        self.alice = User.objects.create_user('alice')
+
+    def get(self) -> tuple[str, int]:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/whoami/')
+        return response.content.decode(), len(queries)
+
+    def test_page_views_make_no_auth_queries(self):
+        self.assertEqual(self.get(), ('anonymous', 0))
+        self.client.force_login(self.alice)
+        self.assertEqual(self.get(), ('alice', 1))
+        self.assertEqual(self.get(), ('alice', 0))
+
+    def test_saving_a_user_evicts_it(self):
+        self.client.force_login(self.alice)
+        self.get()
+        self.alice.username = 'alicia'
+        self.alice.save()
+        self.assertEqual(self.get(), ('alicia', 1))
+
+        self.alice.is_active = False
+        self.alice.save()
+        self.assertEqual(self.get(), ('anonymous', 1))
+
+    def test_logout_reaches_every_worker(self):
+        self.client.force_login(self.alice)
+        self.assertEqual(self.get()[0], 'alice')
+        with override_settings(SESSION_CACHE_ALIAS='worker2'):
+            session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+            import_module(settings.SESSION_ENGINE).SessionStore(session_key).flush()
+        self.assertEqual(self.get()[0], 'anonymous')
+
+    def test_password_change_reaches_every_worker(self):
+        other_worker = UserCache(version_cache='worker2')
+        other_worker.set(self.alice, other_worker.version(self.alice.pk))
+        self.assertEqual(other_worker.get(self.alice.pk), self.alice)
+        self.alice.set_password('new password')
+        self.alice.save()
+        self.assertIsNone(other_worker.get(self.alice.pk))
+
+    def test_project_shares_sessions_and_versions(self):
+        project = import_module('studybuddy.settings')
+        for alias in (project.SESSION_CACHE_ALIAS, project.AUTH_USER_CACHE['VERSION_CACHE']):
+            self.assertNotEqual(project.CACHES[alias]['BACKEND'],
+                                'django.core.cache.backends.locmem.LocMemCache')
+
+    def test_entries_expire(self):
+        cache = UserCache(ttl=60)
+        with mock.patch('core.auth.time.monotonic', return_value=1000):
+            cache.set(self.alice)
+            user = cache.get(self.alice.pk)
+        self.assertEqual(user, self.alice)
+        self.assertIsNot(user, cache.users[self.alice.pk][0])
+        with mock.patch('core.auth.time.monotonic', return_value=1060):
+            self.assertIsNone(cache.get(self.alice.pk))
+
+
+class SQLiteProfileTests(SimpleTestCase):
+    def connect(self, profile: str, directory: str):
+        alias = f'profile_{profile}'
+        config = sqlite_database(Path(directory) / 'profile.sqlite3', profile=profile)
+        connections.settings[alias] = connections.configure_settings(
+            {'default': connections.settings['default'], alias: config})[alias]
+        self.addCleanup(connections.settings.pop, alias)
+        self.addCleanup(connections.__delitem__, alias)
+        self.addCleanup(lambda: connections[alias].close())
+        # Let the test framework allow the alias registered above.
+        databases = mock.patch.object(type(self), 'databases', {alias})
+        databases.start()
+        self.addCleanup(databases.stop)
+        return connections[alias]
+
+    def pragmas(self, connection) -> tuple:
+        with connection.cursor() as cursor:
+            return tuple(cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                         for name in ('journal_mode', 'synchronous', 'cache_size', 'temp_store'))
+
+    def test_production_profile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            connection = self.connect('production', directory)
+            self.assertEqual(self.pragmas(connection), ('wal', 1, -64 * 1024, 2))
+            self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+            self.assertEqual(connection.settings_dict['CONN_MAX_AGE'], 600)
+            with CaptureQueriesContext(connection) as queries:
+                with transaction.atomic(using=connection.alias):
+                    pass
+            self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_default_profile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            connection = self.connect('default', directory)
+            self.assertEqual(self.pragmas(connection)[:2], ('delete', 2))
+            self.assertIsNone(connection.transaction_mode)
+
+
+@override_settings(ROOT_URLCONF='core.tests', STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'core.storage.CompressedManifestStaticFilesStorage'},
+})
+class StaticFilesTests(SimpleTestCase):
+    def test_hashed_and_compressed_assets(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root):
+            call_command('collectstatic', interactive=False, verbosity=0, stdout=StringIO())
+            hashed = staticfiles_storage.url('css/style.css')
+            self.assertRegex(hashed, r'/static/css/style\.[0-9a-f]{12}\.css$')
+
+            response = self.client.get(hashed, headers={'Accept-Encoding': 'gzip, deflate'})
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertIn('Accept-Encoding', response['Vary'])
+            response.close()
+
+            response = self.client.get('/static/css/style.css')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertNotIn('immutable', response['Cache-Control'])
+            response.close()
+            self.assertEqual(self.client.get('/static/../manage.py').status_code, 404)
+
+
+class AvatarTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice')
+
+    def test_generated_default(self):
+        url = avatar_url(self.alice)
+        self.assertRegex(url, r'^/avatars/default/A-\d\.svg$')
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertContains(response, '>A</text>')
+
+    @skipIf(avatars.Image is not None, 'Pillow is installed')
+    def test_upload_needs_pillow(self):
+        self.client.force_login(self.alice)
+        upload = SimpleUploadedFile('me.png', b'not really a png')
+        response = self.client.post('/profile/edit', {'avatar': upload})
+        self.assertContains(response, 'Pillow')
+
+    @skipIf(avatars.Image is None, 'Pillow is not installed')
+    def test_upload_is_resized_under_a_content_hash(self):
+        output = io.BytesIO()
+        avatars.Image.new('RGB', (400, 300), 'red').save(output, 'PNG')
+        with tempfile.TemporaryDirectory() as root, override_settings(MEDIA_ROOT=root):
+            self.client.force_login(self.alice)
+            self.client.post('/profile/edit', {
+                'avatar': SimpleUploadedFile('me.png', output.getvalue())})
+            self.alice.refresh_from_db()
+            url = avatar_url(self.alice, 'small')
+            self.assertRegex(url, r'^/media/avatars/[0-9a-f]{16}-56\.jpg$')
+            response = self.client.get(url)
+            self.assertIn('immutable', response['Cache-Control'])
+            response.close()
@@ -1,3 +1,78 @@
-from django.shortcuts import render
+import mimetypes
+import os
 
-# Create your views here.
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.html import escape
+from django.views.decorators.http import require_safe
+
+from core.avatars import DEFAULT_COLORS
+
+# Hashed names change with their content, so browsers may keep them forever.
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=3600'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+DEFAULT_AVATAR = (
+    '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 64 64">'
+    '<rect width="64" height="64" fill="{color}"/>'
+    '<text x="32" y="43" font-family="sans-serif" font-size="30" fill="#fff" '
+    'text-anchor="middle">{initial}</text></svg>')
+
+
+def serve_file(request: HttpRequest, root, path: str, immutable: bool,
+               encodings=ENCODINGS) -> FileResponse:
+    """
+    Serve ``path`` from the ``root`` directory, preferring a precompressed
+    variant from ``encodings`` that the client accepts.
+    """
+    try:
+        full_path = safe_join(root, path)
+    except SuspiciousFileOperation:
+        raise Http404()
+    if not os.path.isfile(full_path):
+        raise Http404()
+
+    served, encoding = full_path, None
+    accepted = request.headers.get('Accept-Encoding', '')
+    for name, suffix in encodings:
+        if name in accepted and os.path.isfile(full_path + suffix):
+            served, encoding = full_path + suffix, name
+            break
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    response = FileResponse(open(served, 'rb'), filename=os.path.basename(full_path),
+                            content_type=content_type or 'application/octet-stream')
+    if encoding:
+        response['Content-Encoding'] = encoding
+    patch_vary_headers(response, ['Accept-Encoding'])
+    response['Cache-Control'] = IMMUTABLE if immutable else REVALIDATE
+    return response
+
+
+@require_safe
+def serve_static(request: HttpRequest, path: str) -> FileResponse:
+    """Collected static files, with the .br/.gz variants from collectstatic."""
+    hashed = path in getattr(staticfiles_storage, 'hashed_files', {}).values()
+    return serve_file(request, settings.STATIC_ROOT, path, immutable=hashed)
+
+
+@require_safe
+def serve_media(request: HttpRequest, path: str) -> FileResponse:
+    # Avatar file names carry the hash of their content.
+    return serve_file(request, settings.MEDIA_ROOT, path,
+                      immutable=path.startswith('avatars/'), encodings=())
+
+
+@require_safe
+def default_avatar(request: HttpRequest, initial: str, color: int) -> HttpResponse:
+    if len(initial) != 1 or color >= len(DEFAULT_COLORS):
+        raise Http404()
+    response = HttpResponse(DEFAULT_AVATAR.format(
+        color=DEFAULT_COLORS[color], initial=escape(initial)), content_type='image/svg+xml')
+    response['Cache-Control'] = IMMUTABLE
+    return response
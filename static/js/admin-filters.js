@@ -0,0 +1,12 @@
+// Autocomplete changelist filters: reload the list filtered by the chosen row.
+"use strict";
+window.addEventListener("load", () => {
+  django.jQuery(".autocomplete-filter").on("change", (event) => {
+    const url = new URL(window.location.href);
+    if (event.target.value) url.searchParams.set(event.target.name, event.target.value);
+    else url.searchParams.delete(event.target.name);
+    // Start from the first page of the new results.
+    url.searchParams.delete("p");
+    window.location.href = url.toString();
+  });
+});
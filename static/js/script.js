@@ -67,3 +67,119 @@ if (photoInput)
 // Scroll to Bottom
 const conversationThread = document.querySelector(".room__box");
 if (conversationThread) conversationThread.scrollTop = conversationThread.scrollHeight;
+
+// Relative message dates; the server renders absolute ones so that
+// message fragments can be cached.
+const timeAgo = (date) => {
+  const seconds = Math.max(0, (Date.now() - date) / 1000);
+  const units = [["year", 31536000], ["month", 2592000], ["week", 604800],
+                 ["day", 86400], ["hour", 3600], ["minute", 60]];
+  for (const [unit, size] of units) {
+    const count = Math.floor(seconds / size);
+    if (count >= 1) return `${count} ${unit}${count > 1 ? "s" : ""} ago`;
+  }
+  return "just now";
+};
+const refreshDates = () => {
+  document.querySelectorAll("time.thread__date").forEach((time) => {
+    time.textContent = timeAgo(new Date(time.dateTime));
+  });
+};
+refreshDates();
+setInterval(refreshDates, 60000);
+
+// Load More (older messages, more rooms)
+const threadList = document.querySelector(".threads");
+const loadFragment = async (link) => {
+  if (link.dataset.loading) return;
+  link.dataset.loading = "true";
+  const response = await fetch(link.dataset.fragmentUrl);
+  if (response.ok) {
+    link.outerHTML = await response.text();
+    refreshDates();
+  } else delete link.dataset.loading;
+};
+
+document.addEventListener("click", (event) => {
+  const link = event.target.closest("[data-fragment-url]");
+  if (!link) return;
+  event.preventDefault();
+  loadFragment(link);
+});
+
+// Extend the room list as the user scrolls.
+const roomList = document.querySelector(".roomList");
+if (roomList && window.IntersectionObserver) {
+  const observer = new IntersectionObserver((entries) => {
+    entries.forEach((entry) => {
+      if (entry.isIntersecting) loadFragment(entry.target);
+    });
+  });
+  const observeMore = () => roomList.querySelectorAll(".roomList__more").forEach((link) => observer.observe(link));
+  new MutationObserver(observeMore).observe(roomList, { childList: true });
+  observeMore();
+}
+
+// Live Messages: streamed under ASGI, polled otherwise.
+const appendMessage = (message) => {
+  if (threadList.querySelector(`[data-message-id="${message.id}"]`)) return;
+
+  const thread = document.createElement("div");
+  thread.className = "thread";
+  thread.dataset.messageId = message.id;
+  thread.innerHTML = `<div class="thread__top">
+    <div class="thread__author">
+      <a class="thread__authorInfo"><span></span></a>
+      <time class="thread__date">just now</time>
+    </div>
+  </div>
+  <div class="thread__details"></div>`;
+  const author = thread.querySelector(".thread__authorInfo");
+  thread.querySelector("time").dateTime = message.created_at;
+  author.href = `/profile/${message.user.id}`;
+  author.querySelector("span").textContent = `@${message.user.username}`;
+  thread.querySelector(".thread__details").textContent = message.content;
+  threadList.appendChild(thread);
+  conversationThread.scrollTop = conversationThread.scrollHeight;
+};
+if (threadList && threadList.dataset.streamUrl && window.EventSource) {
+  const source = new EventSource(threadList.dataset.streamUrl);
+  source.addEventListener("message", (event) => appendMessage(JSON.parse(event.data)));
+} else if (threadList && threadList.dataset.messagesUrl) {
+  const ids = [...threadList.querySelectorAll("[data-message-id]")].map((thread) => Number(thread.dataset.messageId));
+  let after = Math.max(0, ...ids);
+  const poll = async () => {
+    const response = await fetch(`${threadList.dataset.messagesUrl}?after=${after}`);
+    if (!response.ok) return;
+    const page = await response.json();
+    page.messages.forEach(appendMessage);
+    after = page.next;
+  };
+  setInterval(() => poll().catch(() => {}), 5000);
+}
+
+// Presence: heartbeat while the room is open, leave when it closes.
+const participantList = document.querySelector(".participants[data-presence-url]");
+const csrfInput = document.querySelector(".room__message [name=csrfmiddlewaretoken]");
+if (participantList && csrfInput) {
+  const presenceUrl = participantList.dataset.presenceUrl;
+  const presenceBody = (extra) => {
+    const body = new FormData();
+    body.append("csrfmiddlewaretoken", csrfInput.value);
+    if (extra) body.append(extra, "1");
+    return body;
+  };
+  const heartbeat = async () => {
+    const response = await fetch(presenceUrl, { method: "POST", body: presenceBody() });
+    if (!response.ok) return;
+    const presence = await response.json();
+    participantList.querySelector(".participants__online").textContent = presence.count;
+    participantList.querySelectorAll(".participant").forEach((participant) => {
+      participant.querySelector(".avatar").classList.toggle(
+        "active", presence.online.includes(Number(participant.dataset.userId)));
+    });
+    setTimeout(heartbeat, (presence.ttl * 1000) / 2);
+  };
+  setTimeout(heartbeat, 20000);
+  window.addEventListener("pagehide", () => navigator.sendBeacon(presenceUrl, presenceBody("leave")));
+}
@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from studybuddy.sqlite import sqlite_database
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.routers.PrimaryPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +57,13 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-request query count, DB/view/render timings (Server-Timing header and
+# JSON lines on the "core.metrics" logger). Lower SAMPLE_RATE in production.
+REQUEST_METRICS = {
+    'SAMPLE_RATE': 1.0,
+    'REPEATED_QUERY_THRESHOLD': 5,
+}
+
 ROOT_URLCONF = 'studybuddy.urls'
 
 TEMPLATES = [
@@ -60,8 +72,15 @@ TEMPLATES = [
         'DIRS': [
             BASE_DIR / 'templates'
         ],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Parse each template once per process. Django's autoreloader
+            # still clears the cache when a template changes under runserver.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -78,13 +97,33 @@ WSGI_APPLICATION = 'studybuddy.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# STUDYBUDDY_DB_PROFILE selects a connection profile from studybuddy/sqlite.py:
+# "production" (WAL, busy timeout, mmap, persistent connections) or "default".
+
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': sqlite_database(
+        BASE_DIR / 'db.sqlite3',
+        profile=os.environ.get('STUDYBUDDY_DB_PROFILE', 'production')),
 }
 
+# Read replicas as "path:weight,path:weight" in STUDYBUDDY_REPLICA_DBS. Reads
+# are spread over them by weight; writes, and a client's reads for
+# REPLICA_PIN_SECONDS after it writes, go to the default database.
+
+DATABASE_REPLICAS = {}
+
+for index, replica in enumerate(filter(None, os.environ.get('STUDYBUDDY_REPLICA_DBS', '').split(','))):
+    path, _, weight = replica.partition(':')
+    alias = f'replica{index + 1}'
+    DATABASES[alias] = sqlite_database(
+        path, profile=os.environ.get('STUDYBUDDY_DB_PROFILE', 'production'))
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS[alias] = int(weight or 1)
+
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -126,6 +165,25 @@ STATICFILES_DIRS = [
     BASE_DIR / "static"
 ]
 
+STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# Uploads (avatar thumbnails), served by core.views.serve_media.
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / "media"
+
+# collectstatic writes content-hashed copies of every file plus .gz/.br
+# variants of CSS, JS and SVG; core.views.serve_static serves them with
+# far-future cache headers when DEBUG is off.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': ('django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+                    else 'core.storage.CompressedManifestStaticFilesStorage'),
+    },
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -133,5 +191,85 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'core.User'
 
+# Sessions are read from the "shared" cache and only fall back to the
+# database on a miss, and the user behind a session comes from a
+# per-process cache, so page views make no queries for auth. Cached users
+# live for TTL seconds at most; saving or deleting a user bumps its
+# version in VERSION_CACHE, which evicts it from every worker's cache.
+AUTHENTICATION_BACKENDS = ['core.auth.CachedModelBackend']
+
+AUTH_USER_CACHE = {
+    'TTL': 60,
+    'MAX_USERS': 10_000,
+    'VERSION_CACHE': 'shared',
+}
+
+# The session cache must be shared by every worker: a logout in one has to
+# end the session in all of them.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'shared'
+
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
+
+# Fan-out of new messages to streaming subscribers (SSE and WebSocket).
+# Swap BACKEND for a shared broker when running more than one worker.
+CHATROOMS_BROKER = {
+    'BACKEND': 'chatrooms.broker.InMemoryBroker',
+    'OPTIONS': {'queue_size': 100},
+}
+
+# Token buckets on message posting, as (burst, refill per second). Use
+# chatrooms.throttling.CacheTokenBuckets to share them between workers.
+CHATROOMS_MESSAGE_THROTTLE = {
+    'BACKEND': 'chatrooms.throttling.InMemoryTokenBuckets',
+    'OPTIONS': {},
+    'RATES': {
+        'user': (10, 1.0),
+        'room': (100, 50.0),
+    },
+}
+
+# Who is online in each room, refreshed by client heartbeats and kept out of
+# the database. Use chatrooms.presence.CachePresence (with an "alias"
+# option) to share it between workers.
+CHATROOMS_PRESENCE = {
+    'BACKEND': 'chatrooms.presence.InMemoryPresence',
+    'OPTIONS': {'ttl': 60},
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Used by {% cache %}: rendered messages, two variants per message, so
+    # it needs far more entries than the default 300.
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template-fragments',
+        'OPTIONS': {'MAX_ENTRIES': 20_000},
+    },
+    # Sessions and cached-user versions; every worker on this host shares
+    # the directory. Point it at Redis or Memcached when workers span hosts.
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'shared',
+        'OPTIONS': {'MAX_ENTRIES': 50_000},
+    },
+}
+
+# Sidebar blocks (top topics, topic count, recent activity) are cached in
+# this alias under versioned keys; point it at a shared backend such as
+# Redis or Memcached when running several processes.
+CHATROOMS_SIDEBAR_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Route the home and room pages to their async views. Only worth enabling
+# when serving through studybuddy.asgi.
+CHATROOMS_ASYNC_VIEWS = os.environ.get('STUDYBUDDY_ASYNC_VIEWS') == '1'
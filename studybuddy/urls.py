@@ -14,10 +14,19 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
+from core.views import default_avatar, serve_media, serve_static
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path(f'{settings.MEDIA_URL.strip("/")}/<path:path>', serve_media),
+    path('avatars/default/<str:initial>-<int:color>.svg', default_avatar, name='default_avatar'),
     path('', include('chatrooms.urls'))
 ]
+
+if not settings.DEBUG:
+    # runserver serves static files itself while DEBUG is on.
+    urlpatterns.insert(0, path(f'{settings.STATIC_URL.strip("/")}/<path:path>', serve_static))